@@ -13,6 +13,9 @@ class Settings(BaseSettings):
     mongo_url: str
     db_name: str = "saasit_ai"
     
+    # Workers per process that claim and run queued workflow executions
+    execution_workers: int = 4
+    
     # JWT Settings
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
     algorithm: str = "HS256"
@@ -121,8 +121,9 @@ class ProjectExport(BaseModel):
 class ProjectList(BaseModel):
     projects: List[Project]
     total: int
-    page: int
+    page: Optional[int] = None  # Not set when paging by cursor
     page_size: int
+    next_cursor: Optional[str] = None
     
     
 class ProjectVersion(BaseModel):
@@ -9,6 +9,7 @@ import logging
 
 from app.services.mcp_service import MCPConfigGenerator
 from app.services.github_service import GitHubService
+from app.routers.github import get_github_service
 from app.services.execution_service import ExecutionService
 from app.middleware.auth import get_current_active_user
 from app.models.user import TokenData
@@ -48,16 +49,12 @@ def get_mcp_generator() -> MCPConfigGenerator:
     """Dependency to get MCP config generator"""
     return MCPConfigGenerator()
 
-def get_github_service() -> GitHubService:
-    """Dependency to get GitHub service"""
-    return GitHubService()
-
 def get_execution_service(request: Request) -> ExecutionService:
     """Dependency to get execution service"""
-    db = request.app.state.db
-    if not db:
+    execution_service = getattr(request.app.state, "execution_service", None)
+    if not execution_service:
         raise HTTPException(status_code=503, detail="Database connection not available")
-    return ExecutionService(db)
+    return execution_service
 
 @router.post("/local", response_model=ExecutionModeResponse)
 async def setup_local_execution(
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
 from typing import List, Optional
 from datetime import datetime
 
@@ -14,13 +14,41 @@ router = APIRouter(prefix="/executions", tags=["executions"])
 
 def get_execution_service(request: Request) -> ExecutionService:
     """Get execution service from app state"""
-    db = request.app.state.db
-    if not db:
+    # The shared instance, so cancel/pause reach workflows run by this process's workers
+    execution_service = getattr(request.app.state, "execution_service", None)
+    if not execution_service:
         raise HTTPException(status_code=503, detail="Database connection not available")
+    return execution_service
+
+async def owned_execution(
+    execution_id: str,
+    request: Request,
+    current_user: TokenData = Depends(get_current_active_user)
+) -> WorkflowExecution:
+    """Dependency that loads an execution and verifies the current user owns it"""
+    return await _load_owned_execution(execution_id, request, current_user)
+
+async def rate_limited_owned_execution(
+    execution_id: str,
+    request: Request,
+    current_user: TokenData = Depends(check_rate_limit)
+) -> WorkflowExecution:
+    """owned_execution for rate-limited routes, taking the user from the rate limit check"""
+    return await _load_owned_execution(execution_id, request, current_user)
+
+async def _load_owned_execution(execution_id: str, request: Request, current_user: TokenData) -> WorkflowExecution:
+    execution = getattr(request.state, "execution", None)
+    if execution is not None:
+        return execution
+    
+    execution_service = get_execution_service(request)
+    execution = await execution_service.get_execution(execution_id, current_user.user_id)
+    if not execution:
+        raise HTTPException(status_code=404, detail="Execution not found")
     
-    # Create execution service instance
-    # In production, this should be a singleton or injected dependency
-    return ExecutionService(db)
+    # Cache for composed dependencies within the same request
+    request.state.execution = execution
+    return execution
 
 @router.post("/", response_model=WorkflowExecution)
 async def create_execution(
@@ -40,19 +68,29 @@ async def create_execution(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{execution_id}", response_model=WorkflowExecution)
-async def get_execution(
-    execution_id: str,
+@router.get("/count")
+async def count_executions(
     request: Request,
-    current_user: TokenData = Depends(get_current_active_user)
+    current_user: TokenData = Depends(get_current_active_user),
+    status: Optional[ExecutionStatus] = None
 ):
-    """Get execution details"""
-    execution_service = get_execution_service(request)
+    """Count user's executions (kept off the list endpoint so listing never pays for it)"""
+    db = request.app.state.db
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database connection not available")
     
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
+    query = {"user_id": current_user.user_id}
+    if status:
+        query["status"] = status.value
     
+    total = await db.executions.count_documents(query)
+    return {"total": total}
+
+@router.get("/{execution_id}", response_model=WorkflowExecution)
+async def get_execution(
+    execution: WorkflowExecution = Depends(owned_execution)
+):
+    """Get execution details"""
     return execution
 
 @router.get("/", response_model=List[WorkflowExecution])
@@ -60,8 +98,8 @@ async def list_executions(
     request: Request,
     current_user: TokenData = Depends(get_current_active_user),
     status: Optional[ExecutionStatus] = None,
-    limit: int = 50,
-    offset: int = 0
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0)
 ):
     """List user's executions"""
     execution_service = get_execution_service(request)
@@ -73,7 +111,7 @@ async def list_executions(
         
         # Get executions from database
         db = request.app.state.db
-        cursor = db.executions.find(query).sort("created_at", -1).skip(offset).limit(limit)
+        cursor = db.executions.find(query).sort("created_at", -1).skip(offset).limit(limit).batch_size(limit)
         executions = await cursor.to_list(length=limit)
         
         return [WorkflowExecution(**execution) for execution in executions]
@@ -86,37 +124,28 @@ async def update_execution(
     execution_id: str,
     update_data: ExecutionUpdate,
     request: Request,
-    current_user: TokenData = Depends(get_current_active_user)
+    execution: WorkflowExecution = Depends(owned_execution)
 ):
     """Update execution details"""
     execution_service = get_execution_service(request)
     
-    # Verify ownership
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
-    
     updated_execution = await execution_service.update_execution(execution_id, update_data)
     if not updated_execution:
         raise HTTPException(status_code=500, detail="Failed to update execution")
     
-    return updated_execution
+    # The update only touches execution-level fields, so the steps already loaded still hold
+    return updated_execution.model_copy(update={"steps": execution.steps})
 
 @router.post("/{execution_id}/start")
 async def start_execution(
     execution_id: str,
     workflow_data: dict,
     request: Request,
-    current_user: TokenData = Depends(check_rate_limit)
+    execution: WorkflowExecution = Depends(rate_limited_owned_execution)
 ):
     """Start workflow execution"""
     execution_service = get_execution_service(request)
     
-    # Verify ownership
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
-    
     if execution.status != ExecutionStatus.PENDING:
         raise HTTPException(
             status_code=400, 
@@ -133,16 +162,11 @@ async def start_execution(
 async def pause_execution(
     execution_id: str,
     request: Request,
-    current_user: TokenData = Depends(get_current_active_user)
+    execution: WorkflowExecution = Depends(owned_execution)
 ):
     """Pause workflow execution"""
     execution_service = get_execution_service(request)
     
-    # Verify ownership
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
-    
     success = await execution_service.pause_execution(execution_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to pause execution")
@@ -153,16 +177,11 @@ async def pause_execution(
 async def resume_execution(
     execution_id: str,
     request: Request,
-    current_user: TokenData = Depends(get_current_active_user)
+    execution: WorkflowExecution = Depends(owned_execution)
 ):
     """Resume paused workflow execution"""
     execution_service = get_execution_service(request)
     
-    # Verify ownership
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
-    
     success = await execution_service.resume_execution(execution_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to resume execution")
@@ -173,16 +192,11 @@ async def resume_execution(
 async def cancel_execution(
     execution_id: str,
     request: Request,
-    current_user: TokenData = Depends(get_current_active_user)
+    execution: WorkflowExecution = Depends(owned_execution)
 ):
     """Cancel workflow execution"""
     execution_service = get_execution_service(request)
     
-    # Verify ownership
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
-    
     success = await execution_service.cancel_execution(execution_id)
     if not success:
         raise HTTPException(status_code=500, detail="Failed to cancel execution")
@@ -193,18 +207,13 @@ async def cancel_execution(
 async def get_terminal_outputs(
     execution_id: str,
     request: Request,
-    current_user: TokenData = Depends(get_current_active_user),
+    execution: WorkflowExecution = Depends(owned_execution),
     step_id: Optional[str] = None,
     limit: int = 1000
 ):
     """Get terminal outputs for an execution"""
     execution_service = get_execution_service(request)
     
-    # Verify ownership
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
-    
     try:
         outputs = await execution_service.get_terminal_outputs(
             execution_id=execution_id,
@@ -219,16 +228,11 @@ async def get_terminal_outputs(
 async def delete_execution(
     execution_id: str,
     request: Request,
-    current_user: TokenData = Depends(get_current_active_user)
+    execution: WorkflowExecution = Depends(owned_execution)
 ):
     """Delete an execution and its associated data"""
     execution_service = get_execution_service(request)
     
-    # Verify ownership
-    execution = await execution_service.get_execution(execution_id, current_user.user_id)
-    if not execution:
-        raise HTTPException(status_code=404, detail="Execution not found")
-    
     # Only allow deletion of completed, failed, or cancelled executions
     if execution.status in [ExecutionStatus.RUNNING, ExecutionStatus.STARTING]:
         raise HTTPException(
@@ -237,18 +241,11 @@ async def delete_execution(
         )
     
     try:
-        db = request.app.state.db
-        
-        # Delete terminal outputs
-        await db.terminal_outputs.delete_many({"execution_id": execution_id})
-        
-        # Delete execution
-        result = await db.executions.delete_one({"_id": execution_id})
-        
-        if result.deleted_count == 0:
-            raise HTTPException(status_code=404, detail="Execution not found")
-        
-        return {"message": "Execution deleted successfully", "execution_id": execution_id}
-        
+        deleted = await execution_service.delete_execution(execution_id)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Execution not found")
+    
+    return {"message": "Execution deleted successfully", "execution_id": execution_id}
\ No newline at end of file
@@ -1,57 +1,99 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import List, Dict, Any, Optional
-from pydantic import BaseModel, Field
+from typing import List, Dict, Any, Optional, Tuple, FrozenSet, Annotated, Callable, NamedTuple
+from functools import lru_cache
+import msgspec
+from msgspec import Meta
 import logging
 
 from app.services.github_service import GitHubService
+from app.services.github_session_service import GitHubSessionService
 from app.middleware.auth import get_current_active_user
 from app.models.user import TokenData
+from app.utils.request_body import msgspec_body
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/github", tags=["github"])
 
-class GitHubTokenRequest(BaseModel):
-    github_token: str = Field(..., description="GitHub OAuth token from Clerk")
+class GitHubTokenRequest(msgspec.Struct):
+    github_token: Annotated[str, Meta(description="GitHub OAuth token from Clerk")]
 
-class CreateRepositoryRequest(BaseModel):
-    name: str = Field(..., description="Repository name")
-    description: Optional[str] = Field(None, description="Repository description")
-    private: bool = Field(False, description="Whether repository should be private")
-    github_token: str = Field(..., description="GitHub OAuth token from Clerk")
+class CreateRepositoryRequest(msgspec.Struct):
+    name: Annotated[str, Meta(description="Repository name")]
+    description: Annotated[Optional[str], Meta(description="Repository description")] = None
+    private: Annotated[bool, Meta(description="Whether repository should be private")] = False
 
-class AnalyzeRepositoryRequest(BaseModel):
-    owner: str = Field(..., description="Repository owner")
-    repo: str = Field(..., description="Repository name")
-    github_token: str = Field(..., description="GitHub OAuth token from Clerk")
+class AnalyzeRepositoryRequest(msgspec.Struct):
+    owner: Annotated[str, Meta(description="Repository owner")]
+    repo: Annotated[str, Meta(description="Repository name")]
 
-class CreatePullRequestRequest(BaseModel):
-    owner: str = Field(..., description="Repository owner")
-    repo: str = Field(..., description="Repository name")
-    title: str = Field(..., description="Pull request title")
-    body: str = Field(..., description="Pull request description")
-    head: str = Field(..., description="Source branch")
-    base: str = Field("main", description="Target branch")
-    github_token: str = Field(..., description="GitHub OAuth token from Clerk")
+class CreatePullRequestRequest(msgspec.Struct):
+    owner: Annotated[str, Meta(description="Repository owner")]
+    repo: Annotated[str, Meta(description="Repository name")]
+    title: Annotated[str, Meta(description="Pull request title")]
+    body: Annotated[str, Meta(description="Pull request description")]
+    head: Annotated[str, Meta(description="Source branch")]
+    base: Annotated[str, Meta(description="Target branch")] = "main"
 
-class SetupWorkflowRequest(BaseModel):
-    owner: str = Field(..., description="Repository owner")
-    repo: str = Field(..., description="Repository name")
-    workflow_config: Dict[str, Any] = Field(..., description="Workflow configuration")
-    github_token: str = Field(..., description="GitHub OAuth token from Clerk")
+class SetupWorkflowRequest(msgspec.Struct):
+    owner: Annotated[str, Meta(description="Repository owner")]
+    repo: Annotated[str, Meta(description="Repository name")]
+    workflow_config: Annotated[Dict[str, Any], Meta(description="Workflow configuration")]
 
-def get_github_service() -> GitHubService:
-    """Dependency to get GitHub service instance"""
-    return GitHubService()
+def get_github_service(request: Request) -> GitHubService:
+    """Dependency to get the shared GitHub service from app state"""
+    github_service = getattr(request.app.state, "github_service", None)
+    if github_service is None:
+        # Lifespan didn't run (e.g. bare TestClient) - create once and reuse
+        github_service = request.app.state.github_service = GitHubService()
+    return github_service
+
+def get_github_session_service(request: Request) -> GitHubSessionService:
+    """Dependency to get GitHub session service instance"""
+    db = request.app.state.db
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database connection not available")
+    return GitHubSessionService(db)
+
+async def get_github_token(
+    session_service: GitHubSessionService = Depends(get_github_session_service),
+    current_user: TokenData = Depends(get_current_active_user)
+) -> str:
+    """Dependency to get the GitHub token stored for the current user"""
+    github_token = await session_service.get_token(current_user.user_id)
+    if not github_token:
+        raise HTTPException(
+            status_code=400,
+            detail="GitHub account not connected. Create a session via POST /github/session first."
+        )
+    return github_token
+
+@router.post("/session")
+async def create_github_session(
+    token_request: GitHubTokenRequest = Depends(msgspec_body(GitHubTokenRequest)),
+    session_service: GitHubSessionService = Depends(get_github_session_service),
+    current_user: TokenData = Depends(get_current_active_user)
+):
+    """Store the user's GitHub token server-side for subsequent GitHub calls"""
+    await session_service.store_token(current_user.user_id, token_request.github_token)
+    return {"connected": True}
+
+@router.delete("/session")
+async def delete_github_session(
+    session_service: GitHubSessionService = Depends(get_github_session_service),
+    current_user: TokenData = Depends(get_current_active_user)
+):
+    """Forget the user's stored GitHub token"""
+    deleted = await session_service.delete_token(current_user.user_id)
+    return {"connected": False, "deleted": deleted}
 
 @router.post("/user")
 async def get_github_user(
-    token_request: GitHubTokenRequest,
-    github_service: GitHubService = Depends(get_github_service),
-    current_user: TokenData = Depends(get_current_active_user)
+    github_token: str = Depends(get_github_token),
+    github_service: GitHubService = Depends(get_github_service)
 ):
     """Get GitHub user information"""
     try:
-        user_info = await github_service.get_user_info(token_request.github_token)
+        user_info = await github_service.get_user_info(github_token)
         return {
             "user": user_info,
             "connected": True
@@ -62,15 +104,12 @@ async def get_github_user(
 
 @router.post("/repositories")
 async def get_user_repositories(
-    token_request: GitHubTokenRequest,
-    github_service: GitHubService = Depends(get_github_service),
-    current_user: TokenData = Depends(get_current_active_user)
+    github_token: str = Depends(get_github_token),
+    github_service: GitHubService = Depends(get_github_service)
 ):
     """Get user's GitHub repositories"""
     try:
-        repositories = await github_service.get_user_repositories(
-            token_request.github_token
-        )
+        repositories = await github_service.get_user_repositories(github_token)
         return {
             "repositories": repositories,
             "count": len(repositories)
@@ -81,14 +120,14 @@ async def get_user_repositories(
 
 @router.post("/repositories/create")
 async def create_repository(
-    request: CreateRepositoryRequest,
-    github_service: GitHubService = Depends(get_github_service),
-    current_user: TokenData = Depends(get_current_active_user)
+    request: CreateRepositoryRequest = Depends(msgspec_body(CreateRepositoryRequest)),
+    github_token: str = Depends(get_github_token),
+    github_service: GitHubService = Depends(get_github_service)
 ):
     """Create a new GitHub repository"""
     try:
         repository = await github_service.create_repository(
-            github_token=request.github_token,
+            github_token=github_token,
             name=request.name,
             description=request.description,
             private=request.private
@@ -103,20 +142,20 @@ async def create_repository(
 
 @router.post("/repositories/analyze")
 async def analyze_repository(
-    request: AnalyzeRepositoryRequest,
-    github_service: GitHubService = Depends(get_github_service),
-    current_user: TokenData = Depends(get_current_active_user)
+    request: AnalyzeRepositoryRequest = Depends(msgspec_body(AnalyzeRepositoryRequest)),
+    github_token: str = Depends(get_github_token),
+    github_service: GitHubService = Depends(get_github_service)
 ):
     """Analyze repository structure and detect frameworks/conventions"""
     try:
         # Get basic repository info
         repo_info = await github_service.get_repository(
-            request.github_token, request.owner, request.repo
+            github_token, request.owner, request.repo
         )
         
         # Analyze structure
         analysis = await github_service.analyze_repository_structure(
-            request.github_token, request.owner, request.repo
+            github_token, request.owner, request.repo
         )
         
         return {
@@ -131,7 +170,7 @@ async def analyze_repository(
                 "updated_at": repo_info["updated_at"]
             },
             "analysis": analysis,
-            "suggestions": await _generate_agent_suggestions(analysis)
+            "suggestions": _generate_agent_suggestions(analysis)
         }
     except Exception as e:
         logger.error(f"Failed to analyze repository: {e}")
@@ -139,14 +178,14 @@ async def analyze_repository(
 
 @router.post("/repositories/setup-workflow")
 async def setup_workflow(
-    request: SetupWorkflowRequest,
-    github_service: GitHubService = Depends(get_github_service),
-    current_user: TokenData = Depends(get_current_active_user)
+    request: SetupWorkflowRequest = Depends(msgspec_body(SetupWorkflowRequest)),
+    github_token: str = Depends(get_github_token),
+    github_service: GitHubService = Depends(get_github_service)
 ):
     """Setup GitHub Actions workflow for SaasIt.ai execution"""
     try:
         result = await github_service.setup_saasit_workflow(
-            github_token=request.github_token,
+            github_token=github_token,
             owner=request.owner,
             repo=request.repo,
             workflow_config=request.workflow_config
@@ -161,14 +200,14 @@ async def setup_workflow(
 
 @router.post("/pull-requests/create")
 async def create_pull_request(
-    request: CreatePullRequestRequest,
-    github_service: GitHubService = Depends(get_github_service),
-    current_user: TokenData = Depends(get_current_active_user)
+    request: CreatePullRequestRequest = Depends(msgspec_body(CreatePullRequestRequest)),
+    github_token: str = Depends(get_github_token),
+    github_service: GitHubService = Depends(get_github_service)
 ):
     """Create a pull request"""
     try:
         pull_request = await github_service.create_pull_request(
-            github_token=request.github_token,
+            github_token=github_token,
             owner=request.owner,
             repo=request.repo,
             title=request.title,
@@ -189,14 +228,13 @@ async def get_file_content(
     owner: str,
     repo: str,
     path: str,
-    token_request: GitHubTokenRequest,
-    github_service: GitHubService = Depends(get_github_service),
-    current_user: TokenData = Depends(get_current_active_user)
+    github_token: str = Depends(get_github_token),
+    github_service: GitHubService = Depends(get_github_service)
 ):
     """Get content of a specific file"""
     try:
         content = await github_service.get_file_content(
-            token_request.github_token, owner, repo, path
+            github_token, owner, repo, path
         )
         return {
             "path": path,
@@ -206,70 +244,81 @@ async def get_file_content(
         logger.error(f"Failed to get file content: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
-async def _generate_agent_suggestions(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
-    """Generate intelligent agent suggestions based on repository analysis"""
-    suggestions = []
-    
+class _SuggestionFeatures(NamedTuple):
+    """Hashable fingerprint of the analysis fields the suggestion rules read"""
+    languages: FrozenSet[str]
+    package_managers: FrozenSet[str]
+    has_tests: bool
+    has_docs: bool
+    has_ci: bool
+    build_tools: FrozenSet[str]
+
+# Suggestion rules in priority order: (predicate, suggestion)
+_ALL_RULES: Tuple[Tuple[Callable[[_SuggestionFeatures], bool], Dict[str, Any]], ...] = (
     # Detect project type and suggest appropriate agents
-    if "javascript" in analysis["languages"]:
-        if "npm" in analysis["package_managers"]:
-            suggestions.append({
-                "agent": "frontend-developer",
-                "reason": "JavaScript/npm project detected - can enhance UI/UX",
-                "priority": "high"
-            })
-        
-        suggestions.append({
-            "agent": "test-writer-fixer", 
-            "reason": "JavaScript project - can add/improve tests",
-            "priority": "medium" if analysis["has_tests"] else "high"
-        })
-    
-    if "python" in analysis["languages"]:
-        suggestions.append({
-            "agent": "backend-architect",
-            "reason": "Python project detected - can enhance backend architecture", 
-            "priority": "high"
-        })
-        
-        if not analysis["has_tests"]:
-            suggestions.append({
-                "agent": "test-writer-fixer",
-                "reason": "No tests detected - can add comprehensive test suite",
-                "priority": "high"
-            })
-    
-    if not analysis["has_docs"]:
-        suggestions.append({
-            "agent": "technical-writer",
-            "reason": "No documentation detected - can create README and docs",
-            "priority": "medium"
-        })
-    
-    if not analysis["has_ci"]:
-        suggestions.append({
-            "agent": "devops-automator", 
-            "reason": "No CI/CD detected - can setup GitHub Actions",
-            "priority": "medium"
-        })
-    
+    (lambda f: "javascript" in f.languages and "npm" in f.package_managers, {
+        "agent": "frontend-developer",
+        "reason": "JavaScript/npm project detected - can enhance UI/UX",
+        "priority": "high"
+    }),
+    (lambda f: "javascript" in f.languages and f.has_tests, {
+        "agent": "test-writer-fixer",
+        "reason": "JavaScript project - can add/improve tests",
+        "priority": "medium"
+    }),
+    (lambda f: "javascript" in f.languages and not f.has_tests, {
+        "agent": "test-writer-fixer",
+        "reason": "JavaScript project - can add/improve tests",
+        "priority": "high"
+    }),
+    (lambda f: "python" in f.languages, {
+        "agent": "backend-architect",
+        "reason": "Python project detected - can enhance backend architecture",
+        "priority": "high"
+    }),
+    (lambda f: "python" in f.languages and not f.has_tests, {
+        "agent": "test-writer-fixer",
+        "reason": "No tests detected - can add comprehensive test suite",
+        "priority": "high"
+    }),
+    (lambda f: not f.has_docs, {
+        "agent": "technical-writer",
+        "reason": "No documentation detected - can create README and docs",
+        "priority": "medium"
+    }),
+    (lambda f: not f.has_ci, {
+        "agent": "devops-automator",
+        "reason": "No CI/CD detected - can setup GitHub Actions",
+        "priority": "medium"
+    }),
     # Security and performance suggestions
-    suggestions.append({
+    (lambda f: True, {
         "agent": "security-auditor",
         "reason": "Can review code for security vulnerabilities",
         "priority": "medium"
-    })
-    
-    if "docker" not in analysis["build_tools"]:
-        suggestions.append({
-            "agent": "devops-automator",
-            "reason": "Can containerize the application",
-            "priority": "low"
-        })
-    
-    return suggestions[:6]  # Limit to top 6 suggestions
+    }),
+    (lambda f: "docker" not in f.build_tools, {
+        "agent": "devops-automator",
+        "reason": "Can containerize the application",
+        "priority": "low"
+    }),
+)
+
+def _generate_agent_suggestions(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Generate intelligent agent suggestions based on repository analysis"""
+    features = _SuggestionFeatures(
+        languages=frozenset(analysis["languages"]),
+        package_managers=frozenset(analysis["package_managers"]),
+        has_tests=analysis["has_tests"],
+        has_docs=analysis["has_docs"],
+        has_ci=analysis["has_ci"],
+        build_tools=frozenset(analysis["build_tools"]),
+    )
+    # Copy so callers never mutate the shared rule suggestions
+    return [dict(suggestion) for suggestion in _suggest(features)]
 
-@router.on_event("shutdown")
-async def shutdown_event():
-    """Cleanup on shutdown"""
-    # GitHub service will be cleaned up automatically
\ No newline at end of file
+@lru_cache(maxsize=1024)
+def _suggest(features: _SuggestionFeatures) -> Tuple[Dict[str, Any], ...]:
+    """Evaluate the suggestion rules for an analysis fingerprint (memoized)"""
+    suggestions = [suggestion for predicate, suggestion in _ALL_RULES if predicate(features)]
+    return tuple(suggestions[:6])  # Limit to top 6 suggestions
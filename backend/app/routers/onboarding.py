@@ -1,18 +1,61 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Query
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import httpx
 import asyncio
 import subprocess
+import shutil
+import os
+import signal
 import json
 import re
+import time
+import logging
+import weakref
 from datetime import datetime
+from pymongo import WriteConcern
+
+try:
+    import ahocorasick
+except ImportError:  # Optional accelerator - fall back to per-keyword str.find
+    ahocorasick = None
 
 from ..models.user import TokenData
 from ..middleware.auth import get_current_user, check_rate_limit
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/onboarding", tags=["onboarding"])
 
+# Shared client for local Claude Code probes, created on first use and closed on shutdown
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Get the pooled HTTP client used for detection probes"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            timeout=httpx.Timeout(2.0),
+            limits=httpx.Limits(max_keepalive_connections=16)
+        )
+    return _HTTP_CLIENT
+
+# Detection results per (user_id, check_method): hits are cached longer than misses
+_DETECTION_CACHE: Dict[Tuple[str, str], Tuple[float, "ClaudeCodeDetectionResponse"]] = {}
+_DETECTION_CACHE_MAX_ENTRIES = 10000
+TTL_FOUND = 27.0
+TTL_MISS = 9.0
+
+# One in-flight detection per user; locks disappear once no request holds or awaits them
+_DETECTION_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+async def close_http_client():
+    """Close the shared detection HTTP client"""
+    global _HTTP_CLIENT
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+        _HTTP_CLIENT = None
+
 class ClaudeCodeDetectionRequest(BaseModel):
     check_method: str = Field(default="api", pattern="^(api|command|both)$", description="Detection method: api, command, or both")
 
@@ -51,6 +94,123 @@ class CLAUDEMdAnalysisResponse(BaseModel):
     structure_info: Dict[str, Any]
     recommendations: List[str]
 
+# Version patterns in priority order, compiled once
+_VERSION_PATTERNS = tuple(
+    re.compile(pattern, re.IGNORECASE)
+    for pattern in (
+        r"claude-code@([\d\.]+)",
+        r"version\s+([\d\.]+)",
+        r"v([\d\.]+)",
+        r"([\d\.]+)"
+    )
+)
+
+# Technology keywords matched against CLAUDE.md content
+TECH_PATTERNS = {
+    "React": ["react", "jsx", "tsx"],
+    "Vue": ["vue", "vue.js"],
+    "Angular": ["angular", "@angular"],
+    "Next.js": ["next.js", "nextjs"],
+    "Node.js": ["node.js", "nodejs", "npm", "yarn"],
+    "FastAPI": ["fastapi", "uvicorn"],
+    "Django": ["django", "python"],
+    "Flask": ["flask"],
+    "PostgreSQL": ["postgresql", "postgres"],
+    "MongoDB": ["mongodb", "mongo"],
+    "MySQL": ["mysql"],
+    "Redis": ["redis"],
+    "Docker": ["docker", "dockerfile"],
+    "TypeScript": ["typescript", "ts"],
+    "JavaScript": ["javascript", "js"],
+    "Python": ["python", "pip"],
+    "Tailwind": ["tailwind", "tailwindcss"],
+    "Material-UI": ["material-ui", "mui"],
+    "Chakra UI": ["chakra", "chakra-ui"]
+}
+
+# Primary framework, in priority order
+FRAMEWORK_PRIORITY = ["Next.js", "React", "Vue", "Angular", "FastAPI", "Django", "Flask"]
+
+# Project type keywords; the first matching type wins
+PROJECT_TYPE_PATTERNS = {
+    "SaaS": ["saas", "subscription", "auth", "payment", "stripe"],
+    "E-commerce": ["e-commerce", "ecommerce", "shop", "cart", "product"],
+    "AI Application": ["ai", "machine learning", "openai", "anthropic", "claude"],
+    "Mobile App": ["mobile", "react native", "expo", "ios", "android"],
+    "Dashboard": ["dashboard", "admin", "analytics", "chart"],
+    "API": ["api", "rest", "graphql", "endpoint"]
+}
+
+# Complexity keywords; the last matching level wins
+COMPLEXITY_INDICATORS = {
+    "simple": ["simple", "basic", "starter", "template"],
+    "moderate": ["moderate", "full-stack", "database", "auth"],
+    "complex": ["complex", "microservices", "scale", "enterprise", "distributed"]
+}
+
+AGENT_PATTERNS = [
+    "rapid-prototyper", "frontend-developer", "backend-architect", "ui-designer",
+    "devops-automator", "ai-engineer", "mobile-app-builder", "test-writer-fixer"
+]
+
+STRUCTURE_SECTIONS = ["commands", "architecture", "tech stack", "important", "instructions"]
+
+AUTH_KEYWORDS = ["authentication", "auth"]
+
+# Every keyword the analysis looks for, so the content is scanned once
+_ALL_KEYWORDS = frozenset(
+    [pattern for patterns in TECH_PATTERNS.values() for pattern in patterns]
+    + [pattern for patterns in PROJECT_TYPE_PATTERNS.values() for pattern in patterns]
+    + [pattern for patterns in COMPLEXITY_INDICATORS.values() for pattern in patterns]
+    + AGENT_PATTERNS
+    + STRUCTURE_SECTIONS
+    + AUTH_KEYWORDS
+)
+
+def _build_keyword_automaton():
+    """Build an Aho-Corasick automaton over all keywords (None if unavailable)"""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for keyword in _ALL_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+# Content is lowercased in bounded chunks rather than copied whole; chunks overlap
+# by the longest keyword so matches spanning a boundary are not lost
+_SCAN_CHUNK_SIZE = 4096
+_MAX_KEYWORD_LENGTH = max(len(keyword) for keyword in _ALL_KEYWORDS)
+
+def _scan_keywords(content: str) -> Dict[str, int]:
+    """
+    Case-insensitively map every keyword present in the content to the index of its first occurrence.
+    """
+    hits = {}
+    overlap = _MAX_KEYWORD_LENGTH - 1
+    
+    for chunk_start in range(0, len(content), _SCAN_CHUNK_SIZE):
+        chunk = content[chunk_start:chunk_start + _SCAN_CHUNK_SIZE + overlap].lower()
+        
+        if _KEYWORD_AUTOMATON is None:
+            for keyword in _ALL_KEYWORDS:
+                if keyword not in hits:
+                    start_idx = chunk.find(keyword)
+                    if start_idx != -1:
+                        hits[keyword] = chunk_start + start_idx
+        else:
+            # Matches arrive ordered by end index, so the first hit per keyword is its first occurrence
+            for end_idx, keyword in _KEYWORD_AUTOMATON.iter(chunk):
+                if keyword not in hits:
+                    hits[keyword] = chunk_start + end_idx - len(keyword) + 1
+        
+        if len(hits) == len(_ALL_KEYWORDS):
+            break
+    
+    return hits
+
 @router.post("/detect-claude-code", response_model=ClaudeCodeDetectionResponse)
 async def detect_claude_code(
     request: ClaudeCodeDetectionRequest,
@@ -61,61 +221,112 @@ async def detect_claude_code(
     This endpoint supports multiple detection methods for maximum compatibility.
     """
     
-    detection_results = {
-        "has_claude_code": False,
-        "version": None,
-        "status": "not-found",
-        "detection_method": None,
-        "additional_info": {}
-    }
+    cache_key = (current_user.user_id, request.check_method)
+    cached = _DETECTION_CACHE.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    lock = _DETECTION_LOCKS.get(current_user.user_id)
+    if lock is None:
+        lock = _DETECTION_LOCKS[current_user.user_id] = asyncio.Lock()
+    
+    async with lock:
+        # Concurrent duplicates wait here and pick up the result of the first request
+        cached = _DETECTION_CACHE.get(cache_key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        result = await _run_claude_code_detection(request.check_method)
+        
+        # Errors are not cached so a transient failure can be retried immediately
+        if result.status != "error":
+            ttl = TTL_FOUND if result.has_claude_code else TTL_MISS
+            if len(_DETECTION_CACHE) >= _DETECTION_CACHE_MAX_ENTRIES:
+                now = time.monotonic()
+                for key in [k for k, (expires_at, _) in _DETECTION_CACHE.items() if expires_at <= now]:
+                    del _DETECTION_CACHE[key]
+                if len(_DETECTION_CACHE) >= _DETECTION_CACHE_MAX_ENTRIES:
+                    _DETECTION_CACHE.clear()
+            _DETECTION_CACHE[cache_key] = (time.monotonic() + ttl, result)
+        
+        return result
+
+# Shown when no detection method finds Claude Code
+_NOT_FOUND_SUGGESTIONS = (
+    "Install Claude Code from https://claude.ai/code",
+    "Ensure Claude Code is in your PATH",
+    "Try restarting your terminal after installation"
+)
+
+# Hard cap on the whole detection run so a slow probe can't hold a worker
+DETECTION_TIMEOUT_SECONDS = 8.0
+
+async def _run_claude_code_detection(check_method: str) -> ClaudeCodeDetectionResponse:
+    """
+    Run the configured detection methods within the overall time budget.
+    """
+    
+    try:
+        # Cancellation propagates into the probes, which clean up their tasks and processes
+        return await asyncio.wait_for(_detect_with_methods(check_method), timeout=DETECTION_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        return ClaudeCodeDetectionResponse(
+            has_claude_code=False,
+            status="error",
+            error_message=f"Detection timeout: budget of {DETECTION_TIMEOUT_SECONDS:g}s exceeded",
+            additional_info={"error_type": "TimeoutError"}
+        )
+
+async def _detect_with_methods(check_method: str) -> ClaudeCodeDetectionResponse:
+    """
+    Run the configured detection methods and build the response.
+    """
     
     try:
         # Method 1: Try to detect via API calls (check for local Claude Code server)
-        if request.check_method in ["api", "both"]:
+        if check_method in ["api", "both"]:
             api_result = await _detect_via_api()
             if api_result["found"]:
-                detection_results.update({
-                    "has_claude_code": True,
-                    "version": api_result.get("version"),
-                    "status": "found",
-                    "detection_method": "api",
-                    "additional_info": api_result
-                })
-                return ClaudeCodeDetectionResponse(**detection_results)
+                return ClaudeCodeDetectionResponse(
+                    has_claude_code=True,
+                    version=api_result.get("version"),
+                    status="found",
+                    detection_method="api",
+                    additional_info=api_result
+                )
         
         # Method 2: Try command line detection
-        if request.check_method in ["command", "both"]:
+        if check_method in ["command", "both"]:
             command_result = await _detect_via_command()
             if command_result["found"]:
-                detection_results.update({
-                    "has_claude_code": True,
-                    "version": command_result.get("version"),
-                    "status": "found",
-                    "detection_method": "command",
-                    "additional_info": command_result
-                })
-                return ClaudeCodeDetectionResponse(**detection_results)
+                return ClaudeCodeDetectionResponse(
+                    has_claude_code=True,
+                    version=command_result.get("version"),
+                    status="found",
+                    detection_method="command",
+                    additional_info=command_result
+                )
         
         # If no detection method found Claude Code
-        detection_results["status"] = "not-found"
-        detection_results["additional_info"] = {
-            "checked_methods": request.check_method,
-            "suggestions": [
-                "Install Claude Code from https://claude.ai/code",
-                "Ensure Claude Code is in your PATH",
-                "Try restarting your terminal after installation"
-            ]
-        }
-        
-        return ClaudeCodeDetectionResponse(**detection_results)
+        return ClaudeCodeDetectionResponse(
+            has_claude_code=False,
+            status="not-found",
+            additional_info={
+                "checked_methods": check_method,
+                "suggestions": list(_NOT_FOUND_SUGGESTIONS)
+            }
+        )
         
     except Exception as e:
-        detection_results.update({
-            "status": "error",
-            "error_message": str(e),
-            "additional_info": {"error_type": type(e).__name__}
-        })
-        return ClaudeCodeDetectionResponse(**detection_results)
+        return ClaudeCodeDetectionResponse(
+            has_claude_code=False,
+            status="error",
+            error_message=str(e),
+            additional_info={"error_type": type(e).__name__}
+        )
+
+# Overall budget for the concurrent local API probes
+API_DETECTION_TIMEOUT_SECONDS = 2.0
 
 async def _detect_via_api() -> Dict[str, Any]:
     """
@@ -123,42 +334,65 @@ async def _detect_via_api() -> Dict[str, Any]:
     Claude Code may run a local server that we can ping.
     """
     possible_ports = [3001, 3000, 8080, 8000]
+    # Try common Claude Code API endpoints
+    endpoint_paths = ["/api/health", "/health", "/version", "/api/version"]
     
-    for port in possible_ports:
-        try:
-            async with httpx.AsyncClient(timeout=2.0) as client:
-                # Try common Claude Code API endpoints
-                endpoints_to_try = [
-                    f"http://localhost:{port}/api/health",
-                    f"http://localhost:{port}/health",
-                    f"http://localhost:{port}/version",
-                    f"http://localhost:{port}/api/version"
-                ]
-                
-                for endpoint in endpoints_to_try:
-                    try:
-                        response = await client.get(endpoint)
-                        if response.status_code == 200:
-                            data = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
-                            
-                            # Check if response indicates Claude Code
-                            response_text = response.text.lower()
-                            if any(keyword in response_text for keyword in ["claude", "anthropic", "claude-code"]):
-                                return {
-                                    "found": True,
-                                    "method": "api",
-                                    "port": port,
-                                    "endpoint": endpoint,
-                                    "version": data.get("version"),
-                                    "response_data": data
-                                }
-                    except (httpx.HTTPError, ValueError):
-                        continue
-        except Exception:
-            continue
+    client = _get_http_client()
+    
+    # Probe every port/endpoint concurrently and take the first Claude Code match
+    tasks = [
+        asyncio.create_task(_probe_api_endpoint(client, port, f"http://localhost:{port}{path}"))
+        for port in possible_ports
+        for path in endpoint_paths
+    ]
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + API_DETECTION_TIMEOUT_SECONDS
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                result = task.result()
+                if result:
+                    return result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
     
     return {"found": False, "method": "api"}
 
+# Claude Code signature, matched on the raw bytes of the first part of a probe response
+# ("claude-code" is covered by "claude")
+_CLAUDE_SIGNATURE_RE = re.compile(rb"claude|anthropic", re.IGNORECASE)
+_SIGNATURE_SCAN_BYTES = 4096
+
+async def _probe_api_endpoint(client: httpx.AsyncClient, port: int, endpoint: str) -> Optional[Dict[str, Any]]:
+    """
+    Probe a single endpoint, returning detection info if it looks like Claude Code.
+    """
+    try:
+        response = await client.get(endpoint)
+        # Check if response indicates Claude Code before doing any decoding
+        if response.status_code == 200 and _CLAUDE_SIGNATURE_RE.search(response.content[:_SIGNATURE_SCAN_BYTES]):
+            data = response.json() if response.headers.get("content-type", "").startswith("application/json") else {}
+            return {
+                "found": True,
+                "method": "api",
+                "port": port,
+                "endpoint": endpoint,
+                "version": data.get("version"),
+                "response_data": data
+            }
+    except (httpx.HTTPError, ValueError):
+        pass
+    return None
+
 async def _detect_via_command() -> Dict[str, Any]:
     """
     Try to detect Claude Code via command line.
@@ -171,58 +405,126 @@ async def _detect_via_command() -> Dict[str, Any]:
         ["claude", "-v"]
     ]
     
-    for command in commands_to_try:
+    # Only spawn commands whose executable is actually on PATH
+    resolved = await asyncio.to_thread(
+        _resolve_executables, {command[0] for command in commands_to_try}
+    )
+    commands_to_try = [command for command in commands_to_try if resolved[command[0]]]
+    if not commands_to_try:
+        return {"found": False, "method": "command"}
+    
+    # Launch all candidates concurrently and take the first one that succeeds
+    tasks = [
+        asyncio.create_task(_try_command([resolved[command[0]], *command[1:]], " ".join(command)))
+        for command in commands_to_try
+    ]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if result:
+                return result
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    return {"found": False, "method": "command"}
+
+def _resolve_executables(names: set) -> Dict[str, Optional[str]]:
+    """
+    Resolve executable names to absolute paths (None when not on PATH).
+    """
+    return {name: shutil.which(name) for name in names}
+
+# Version strings are tiny; anything past this is not worth reading
+_MAX_VERSION_OUTPUT_BYTES = 1024
+# Time a probe gets to exit after SIGTERM before it is killed
+_TERMINATE_GRACE_SECONDS = 0.05
+
+async def _read_version_output(process: asyncio.subprocess.Process) -> bytes:
+    """
+    Read a bounded amount of stdout and wait for the process to exit.
+    """
+    output = b""
+    while len(output) < _MAX_VERSION_OUTPUT_BYTES:
+        chunk = await process.stdout.read(_MAX_VERSION_OUTPUT_BYTES - len(output))
+        if not chunk:
+            break
+        output += chunk
+    await process.wait()
+    return output
+
+async def _stop_process(process: asyncio.subprocess.Process) -> None:
+    """
+    Terminate a probe's process group, escalating to kill if it doesn't exit promptly.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        await asyncio.wait_for(process.wait(), timeout=_TERMINATE_GRACE_SECONDS)
+    except ProcessLookupError:
+        await process.wait()
+    except asyncio.TimeoutError:
         try:
-            # Run command with timeout
-            process = await asyncio.create_subprocess_exec(
-                *command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await process.wait()
+
+async def _try_command(command: List[str], display_command: str) -> Optional[Dict[str, Any]]:
+    """
+    Run a single version command, returning detection info if it succeeds.
+    """
+    try:
+        # Run command with timeout; stderr is never inspected, so don't pipe it
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            # Own process group so wrappers like npx can be stopped with their children
+            start_new_session=True
+        )
+        
+        try:
+            stdout = await asyncio.wait_for(_read_version_output(process), timeout=5.0)
+        except asyncio.TimeoutError:
+            await _stop_process(process)
+            return None
+        except asyncio.CancelledError:
+            # Another candidate won - don't leave this one running
+            await _stop_process(process)
+            raise
+        
+        if process.returncode == 0:
+            output = stdout.decode(errors="replace").strip()
             
-            try:
-                stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=5.0)
-                
-                if process.returncode == 0:
-                    output = stdout.decode().strip()
-                    
-                    # Extract version using regex
-                    version_patterns = [
-                        r"claude-code@([\d\.]+)",
-                        r"version\s+([\d\.]+)",
-                        r"v([\d\.]+)",
-                        r"([\d\.]+)"
-                    ]
-                    
-                    version = None
-                    for pattern in version_patterns:
-                        match = re.search(pattern, output, re.IGNORECASE)
-                        if match:
-                            version = match.group(1)
-                            break
-                    
-                    return {
-                        "found": True,
-                        "method": "command",
-                        "command": " ".join(command),
-                        "version": version,
-                        "output": output
-                    }
-                    
-            except asyncio.TimeoutError:
-                # Kill the process if it times out
-                process.kill()
-                await process.wait()
-                
-        except (FileNotFoundError, PermissionError):
-            # Command not found or permission denied
-            continue
-        except Exception as e:
-            # Log unexpected errors but continue trying other commands
-            print(f"Unexpected error running {command}: {e}")
-            continue
+            # Extract version using regex
+            version = None
+            for pattern in _VERSION_PATTERNS:
+                match = pattern.search(output)
+                if match:
+                    version = match.group(1)
+                    break
+            
+            return {
+                "found": True,
+                "method": "command",
+                "command": display_command,
+                "version": version,
+                "output": output
+            }
+            
+    except (FileNotFoundError, PermissionError):
+        # Command not found or permission denied
+        pass
+    except Exception as e:
+        # Log unexpected errors but continue trying other commands
+        logger.debug(
+            "Subprocess probe failed",
+            extra={"command": display_command, "error": str(e)},
+            exc_info=True
+        )
     
-    return {"found": False, "method": "command"}
+    return None
 
 @router.post("/next-question", response_model=OnboardingQuestionResponse)
 async def get_next_question(
@@ -241,81 +543,80 @@ async def get_next_question(
         # TODO: Integrate with Claude service for intelligent question generation
         # For now, using a simple rule-based approach
         
-        question_flow = await _get_question_flow(answer_request)
-        
-        return OnboardingQuestionResponse(**question_flow)
+        return _get_question_flow(answer_request)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating next question: {str(e)}")
 
-async def _get_question_flow(answer_request: OnboardingAnswerRequest) -> Dict[str, Any]:
+# Static question flow, built once at import and shared across requests
+_QUESTION_FLOWS: Dict[str, OnboardingQuestionResponse] = {
+    "project_type": OnboardingQuestionResponse(
+        question_id="project_goal",
+        question="What's the main goal of your project?",
+        question_type="single_choice",
+        options=[
+            "Build a SaaS application",
+            "Create an AI-powered tool",
+            "Develop an e-commerce platform",
+            "Build a mobile app",
+            "Create a data analysis tool",
+            "Other"
+        ],
+        context="This helps us recommend the right AI agents and templates for your needs.",
+        reasoning="Understanding the project goal allows us to suggest specialized agents.",
+        is_final=False
+    ),
+    "project_goal": OnboardingQuestionResponse(
+        question_id="target_users",
+        question="Who are your target users?",
+        question_type="text",
+        context="Understanding your audience helps us design the right user experience.",
+        reasoning="Target users influence technology choices and agent recommendations.",
+        is_final=False
+    ),
+    "target_users": OnboardingQuestionResponse(
+        question_id="timeline",
+        question="What's your timeline for the first version?",
+        question_type="single_choice",
+        options=[
+            "As soon as possible (days)",
+            "Within a few weeks",
+            "Within a few months",
+            "I'm flexible with timing"
+        ],
+        context="This helps us recommend the right development approach and agent priorities.",
+        reasoning="Timeline affects complexity and agent workflow design.",
+        is_final=False
+    ),
+    "timeline": OnboardingQuestionResponse(
+        question_id="experience",
+        question="How would you describe your development experience?",
+        question_type="single_choice",
+        options=[
+            "Beginner - I'm new to development",
+            "Intermediate - I have some experience",
+            "Advanced - I'm an experienced developer"
+        ],
+        context="This helps us tailor the AI agent recommendations to your skill level.",
+        reasoning="Experience level determines the complexity of agents and guidance needed.",
+        is_final=True
+    )
+}
+
+_QUESTION_FLOW_COMPLETE = OnboardingQuestionResponse(
+    question_id="complete",
+    question="Thank you for your answers!",
+    question_type="text",
+    is_final=True
+)
+
+def _get_question_flow(answer_request: OnboardingAnswerRequest) -> OnboardingQuestionResponse:
     """
     Simple question flow logic. This should be enhanced with Claude integration.
     """
-    
-    # Basic question flow based on question_id
-    question_flows = {
-        "project_type": {
-            "question_id": "project_goal",
-            "question": "What's the main goal of your project?",
-            "question_type": "single_choice",
-            "options": [
-                "Build a SaaS application",
-                "Create an AI-powered tool",
-                "Develop an e-commerce platform",
-                "Build a mobile app",
-                "Create a data analysis tool",
-                "Other"
-            ],
-            "context": "This helps us recommend the right AI agents and templates for your needs.",
-            "reasoning": "Understanding the project goal allows us to suggest specialized agents.",
-            "is_final": False
-        },
-        "project_goal": {
-            "question_id": "target_users",
-            "question": "Who are your target users?",
-            "question_type": "text",
-            "context": "Understanding your audience helps us design the right user experience.",
-            "reasoning": "Target users influence technology choices and agent recommendations.",
-            "is_final": False
-        },
-        "target_users": {
-            "question_id": "timeline",
-            "question": "What's your timeline for the first version?",
-            "question_type": "single_choice",
-            "options": [
-                "As soon as possible (days)",
-                "Within a few weeks",
-                "Within a few months",
-                "I'm flexible with timing"
-            ],
-            "context": "This helps us recommend the right development approach and agent priorities.",
-            "reasoning": "Timeline affects complexity and agent workflow design.",
-            "is_final": False
-        },
-        "timeline": {
-            "question_id": "experience",
-            "question": "How would you describe your development experience?",
-            "question_type": "single_choice",
-            "options": [
-                "Beginner - I'm new to development",
-                "Intermediate - I have some experience",
-                "Advanced - I'm an experienced developer"
-            ],
-            "context": "This helps us tailor the AI agent recommendations to your skill level.",
-            "reasoning": "Experience level determines the complexity of agents and guidance needed.",
-            "is_final": True
-        }
-    }
-    
-    return question_flows.get(answer_request.question_id, {
-        "question_id": "complete",
-        "question": "Thank you for your answers!",
-        "question_type": "text",
-        "is_final": True
-    })
+    return _QUESTION_FLOWS.get(answer_request.question_id, _QUESTION_FLOW_COMPLETE)
 
-@router.post("/analyze-claude-md", response_model=CLAUDEMdAnalysisResponse)
+@router.post("/analyze-claude-md", response_model=CLAUDEMdAnalysisResponse, response_class=ORJSONResponse)
 async def analyze_claude_md(
     request: CLAUDEMdAnalysisRequest,
     current_user: TokenData = Depends(check_rate_limit)
@@ -325,13 +626,15 @@ async def analyze_claude_md(
     """
     
     try:
-        analysis = await _analyze_claude_md_content(request.content, request.repo_url)
-        return CLAUDEMdAnalysisResponse(**analysis)
+        # CPU-bound parsing runs in a worker thread so it doesn't block the event loop
+        analysis = await asyncio.to_thread(_analyze_claude_md_sync, request.content, request.repo_url)
+        # Built by our own analyzer with the response shape, so skip re-validating it here
+        return CLAUDEMdAnalysisResponse.model_construct(**analysis)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing CLAUDE.md: {str(e)}")
 
-async def _analyze_claude_md_content(content: str, repo_url: Optional[str] = None) -> Dict[str, Any]:
+def _analyze_claude_md_sync(content: str, repo_url: Optional[str] = None) -> Dict[str, Any]:
     """
     Parse and analyze CLAUDE.md content to extract project information.
     """
@@ -347,90 +650,44 @@ async def _analyze_claude_md_content(content: str, repo_url: Optional[str] = Non
         "recommendations": []
     }
     
-    # Convert content to lowercase for easier matching
-    content_lower = content.lower()
+    # Single case-insensitive pass over the content for every keyword below
+    hits = _scan_keywords(content)
     
     # Technology detection
-    tech_patterns = {
-        "React": ["react", "jsx", "tsx"],
-        "Vue": ["vue", "vue.js"],
-        "Angular": ["angular", "@angular"],
-        "Next.js": ["next.js", "nextjs"],
-        "Node.js": ["node.js", "nodejs", "npm", "yarn"],
-        "FastAPI": ["fastapi", "uvicorn"],
-        "Django": ["django", "python"],
-        "Flask": ["flask"],
-        "PostgreSQL": ["postgresql", "postgres"],
-        "MongoDB": ["mongodb", "mongo"],
-        "MySQL": ["mysql"],
-        "Redis": ["redis"],
-        "Docker": ["docker", "dockerfile"],
-        "TypeScript": ["typescript", "ts"],
-        "JavaScript": ["javascript", "js"],
-        "Python": ["python", "pip"],
-        "Tailwind": ["tailwind", "tailwindcss"],
-        "Material-UI": ["material-ui", "mui"],
-        "Chakra UI": ["chakra", "chakra-ui"]
-    }
-    
-    for tech, patterns in tech_patterns.items():
-        if any(pattern in content_lower for pattern in patterns):
+    for tech, patterns in TECH_PATTERNS.items():
+        if any(pattern in hits for pattern in patterns):
             analysis["technologies"].append(tech)
     
     # Framework detection (primary framework)
-    framework_priority = ["Next.js", "React", "Vue", "Angular", "FastAPI", "Django", "Flask"]
-    for framework in framework_priority:
+    for framework in FRAMEWORK_PRIORITY:
         if framework in analysis["technologies"]:
             analysis["framework"] = framework
             break
     
     # Project type detection
-    project_type_patterns = {
-        "SaaS": ["saas", "subscription", "auth", "payment", "stripe"],
-        "E-commerce": ["e-commerce", "ecommerce", "shop", "cart", "product"],
-        "AI Application": ["ai", "machine learning", "openai", "anthropic", "claude"],
-        "Mobile App": ["mobile", "react native", "expo", "ios", "android"],
-        "Dashboard": ["dashboard", "admin", "analytics", "chart"],
-        "API": ["api", "rest", "graphql", "endpoint"]
-    }
-    
-    for project_type, patterns in project_type_patterns.items():
-        if any(pattern in content_lower for pattern in patterns):
+    for project_type, patterns in PROJECT_TYPE_PATTERNS.items():
+        if any(pattern in hits for pattern in patterns):
             analysis["project_type"] = project_type
             break
     
     # Complexity assessment
-    complexity_indicators = {
-        "simple": ["simple", "basic", "starter", "template"],
-        "moderate": ["moderate", "full-stack", "database", "auth"],
-        "complex": ["complex", "microservices", "scale", "enterprise", "distributed"]
-    }
-    
-    for complexity, patterns in complexity_indicators.items():
-        if any(pattern in content_lower for pattern in patterns):
+    for complexity, patterns in COMPLEXITY_INDICATORS.items():
+        if any(pattern in hits for pattern in patterns):
             analysis["complexity"] = complexity
     
     # Agent mentions detection
-    agent_patterns = [
-        "rapid-prototyper", "frontend-developer", "backend-architect", "ui-designer",
-        "devops-automator", "ai-engineer", "mobile-app-builder", "test-writer-fixer"
-    ]
-    
-    for agent in agent_patterns:
-        if agent in content_lower:
+    for agent in AGENT_PATTERNS:
+        if agent in hits:
             analysis["agents_mentioned"].append(agent)
     
     # Extract structure information
-    sections = ["commands", "architecture", "tech stack", "important", "instructions"]
-    for section in sections:
-        if section in content_lower:
-            # Find the section and extract relevant info
+    for section in STRUCTURE_SECTIONS:
+        if section in hits:
             # This is a simplified extraction - could be enhanced with proper markdown parsing
-            start_idx = content_lower.find(section)
-            if start_idx != -1:
-                # Extract next 200 characters as section content
-                section_content = content[start_idx:start_idx + 200]
-                analysis["structure_info"][section] = section_content
+            start_idx = hits[section]
+            # Extract next 200 characters as section content
+            section_content = content[start_idx:start_idx + 200]
+            analysis["structure_info"][section] = section_content
     
     # Generate recommendations based on analysis
     recommendations = []
@@ -444,7 +701,7 @@ async def _analyze_claude_md_content(content: str, repo_url: Optional[str] = Non
     if analysis["complexity"] == "complex":
         recommendations.append("Consider using DevOps and Backend Architect agents for complex projects")
     
-    if "authentication" in content_lower or "auth" in content_lower:
+    if any(keyword in hits for keyword in AUTH_KEYWORDS):
         recommendations.append("Use Backend Architect agent for secure authentication implementation")
     
     analysis["recommendations"] = recommendations
@@ -455,11 +712,13 @@ async def _analyze_claude_md_content(content: str, repo_url: Optional[str] = Non
 async def save_onboarding_progress(
     progress_data: Dict[str, Any],
     request: Request,
+    sync: bool = Query(False, description="Wait for the database write to be acknowledged"),
     current_user: TokenData = Depends(get_current_user)
 ):
     """
     Save onboarding progress to MongoDB for backup and analytics.
     Primary persistence is through Clerk, but we also save to our database.
+    The backup write is fire-and-forget unless `sync=true` is passed.
     """
     
     try:
@@ -476,11 +735,20 @@ async def save_onboarding_progress(
         
         if db is not None:
             # Upsert onboarding progress
-            await db.onboarding_progress.update_one(
-                {"user_id": current_user.user_id},
-                {"$set": onboarding_doc},
-                upsert=True
-            )
+            if sync:
+                await db.onboarding_progress.update_one(
+                    {"user_id": current_user.user_id},
+                    {"$set": onboarding_doc},
+                    upsert=True
+                )
+            else:
+                # Unacknowledged write off the request path; drained on shutdown
+                collection = db.onboarding_progress.with_options(write_concern=WriteConcern(w=0))
+                _track_background_write(request, collection.update_one(
+                    {"user_id": current_user.user_id},
+                    {"$set": onboarding_doc},
+                    upsert=True
+                ))
         
         return {
             "success": True,
@@ -492,7 +760,25 @@ async def save_onboarding_progress(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving progress: {str(e)}")
 
-@router.get("/resume-progress")
+def _track_background_write(request: Request, write) -> None:
+    """
+    Schedule a database write without awaiting it, keeping a reference so it can be drained.
+    """
+    pending = getattr(request.app.state, "background_writes", None)
+    if pending is None:
+        pending = request.app.state.background_writes = set()
+    
+    task = asyncio.create_task(write)
+    pending.add(task)
+    task.add_done_callback(_on_background_write_done)
+    task.add_done_callback(pending.discard)
+
+def _on_background_write_done(task: asyncio.Task) -> None:
+    """Log failures of fire-and-forget writes"""
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Background onboarding write failed: {task.exception()}")
+
+@router.get("/resume-progress", response_class=ORJSONResponse)
 async def get_onboarding_progress(
     request: Request,
     current_user: TokenData = Depends(get_current_user)
@@ -513,18 +799,21 @@ async def get_onboarding_progress(
                 "source": "no_database"
             }
         
-        # Retrieve from MongoDB
+        # Retrieve from MongoDB (served by the onboarding_user_id_unique index)
         saved_progress = await db.onboarding_progress.find_one(
-            {"user_id": current_user.user_id}
+            {"user_id": current_user.user_id},
+            projection={"progress_data": 1, "saved_at": 1, "_id": 0}
         )
         
         if saved_progress:
-            return {
+            # Serialize the stored document directly, bypassing jsonable_encoder;
+            # orjson encodes saved_at natively
+            return ORJSONResponse({
                 "has_saved_progress": True,
                 "progress_data": saved_progress.get("progress_data"),
                 "saved_at": saved_progress.get("saved_at"),
                 "source": "database"
-            }
+            })
         else:
             return {
                 "has_saved_progress": False,
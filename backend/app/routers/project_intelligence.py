@@ -5,23 +5,32 @@ Provides endpoints for repository analysis, technology detection,
 and AI agent recommendations based on codebase analysis.
 """
 
-from fastapi import APIRouter, HTTPException, Depends, Request
-from typing import Dict, List, Optional, Any
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Depends, Request, Response, Query, BackgroundTasks
+from fastapi.responses import ORJSONResponse
+from typing import Dict, List, Optional, Any, Set, Tuple, Annotated
+from pydantic import BaseModel
+from collections import defaultdict
+from functools import lru_cache
 import logging
+import msgspec
+from msgspec import Meta
+import orjson
 
 from app.services.project_intelligence import ProjectIntelligence
 from app.services.github_service import GitHubService
+from app.services.analysis_job_service import AnalysisJobService
+from app.routers.github import get_github_service
 from app.middleware.auth import get_current_active_user
 from app.models.user import TokenData
+from app.utils.request_body import msgspec_body
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/project-intelligence", tags=["project-intelligence"])
 
-class RepositoryAnalysisRequest(BaseModel):
-    github_token: str = Field(..., description="GitHub OAuth token")
-    owner: str = Field(..., description="Repository owner")
-    repo: str = Field(..., description="Repository name")
+class RepositoryAnalysisRequest(msgspec.Struct):
+    github_token: Annotated[str, Meta(description="GitHub OAuth token")]
+    owner: Annotated[str, Meta(description="Repository owner")]
+    repo: Annotated[str, Meta(description="Repository name")]
 
 class RepositoryAnalysisResponse(BaseModel):
     repository: Dict[str, Any]
@@ -33,10 +42,17 @@ class RepositoryAnalysisResponse(BaseModel):
     enhancement_suggestions: List[Dict[str, Any]]
     confidence_score: float
 
-class AgentRecommendationRequest(BaseModel):
-    repository_analysis: Dict[str, Any] = Field(..., description="Pre-analyzed repository data")
-    user_preferences: Optional[Dict[str, Any]] = Field(None, description="User preferences")
-    project_goals: Optional[List[str]] = Field(None, description="Specific project goals")
+class AnalysisJobResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+class AgentRecommendationRequest(msgspec.Struct):
+    repository_analysis: Annotated[Dict[str, Any], Meta(description="Pre-analyzed repository data")]
+    user_preferences: Annotated[Optional[Dict[str, Any]], Meta(description="User preferences")] = None
+    project_goals: Annotated[Optional[List[str]], Meta(description="Specific project goals")] = None
 
 class AgentRecommendationResponse(BaseModel):
     recommendations: List[Dict[str, Any]]
@@ -44,10 +60,10 @@ class AgentRecommendationResponse(BaseModel):
     estimated_timeline: str
     confidence_score: float
 
-class TechnologyDetectionRequest(BaseModel):
-    github_token: str = Field(..., description="GitHub OAuth token")
-    owner: str = Field(..., description="Repository owner")
-    repo: str = Field(..., description="Repository name")
+class TechnologyDetectionRequest(msgspec.Struct):
+    github_token: Annotated[str, Meta(description="GitHub OAuth token")]
+    owner: Annotated[str, Meta(description="Repository owner")]
+    repo: Annotated[str, Meta(description="Repository name")]
 
 class TechnologyDetectionResponse(BaseModel):
     detected: Dict[str, Any]
@@ -55,17 +71,56 @@ class TechnologyDetectionResponse(BaseModel):
     total_technologies: int
     analysis_coverage: float
 
-def get_project_intelligence() -> ProjectIntelligence:
-    """Dependency to get project intelligence service"""
-    github_service = GitHubService()
+def get_project_intelligence(
+    github_service: GitHubService = Depends(get_github_service)
+) -> ProjectIntelligence:
+    """Dependency to get project intelligence service backed by the shared GitHub client"""
     return ProjectIntelligence(github_service)
 
-@router.post("/analyze-repository", response_model=RepositoryAnalysisResponse)
+def get_analysis_job_service(request: Request) -> AnalysisJobService:
+    """Dependency to get the analysis job service"""
+    db = request.app.state.db
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database connection not available")
+    return AnalysisJobService(db)
+
+def _job_status_url(request: Request, job_id: str) -> str:
+    return request.app.url_path_for("get_analysis_job", job_id=job_id)
+
+async def _run_analysis_job(
+    job_id: str,
+    job_service: AnalysisJobService,
+    project_intelligence: ProjectIntelligence,
+    github_token: str,
+    owner: str,
+    repo: str
+) -> None:
+    """Run a repository analysis in the background and store its outcome on the job"""
+    try:
+        await job_service.mark_running(job_id)
+        analysis_result = await project_intelligence.analyze_repository(
+            github_token=github_token,
+            owner=owner,
+            repo=repo
+        )
+        await job_service.complete_job(job_id, analysis_result)
+        logger.info(f"Analysis job {job_id} completed for {owner}/{repo}")
+    except Exception as e:
+        logger.error(f"Analysis job {job_id} failed for {owner}/{repo}: {e}")
+        await job_service.fail_job(job_id, str(e))
+
+@router.post(
+    "/analyze-repository",
+    responses={200: {"model": RepositoryAnalysisResponse}, 202: {"model": AnalysisJobResponse}}
+)
 async def analyze_repository(
-    request: RepositoryAnalysisRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    request: RepositoryAnalysisRequest = Depends(msgspec_body(RepositoryAnalysisRequest)),
+    background: bool = Query(False, description="Queue the analysis and poll /jobs/{job_id} for the result"),
     project_intelligence: ProjectIntelligence = Depends(get_project_intelligence),
     current_user: TokenData = Depends(get_current_active_user)
-):
+) -> ORJSONResponse:
     """
     Perform comprehensive repository analysis including:
     - Technology and framework detection
@@ -73,7 +128,13 @@ async def analyze_repository(
     - Complexity assessment
     - AI agent recommendations
     - Enhancement suggestions
+    
+    With ``background=true`` the analysis is queued and a 202 with a job id is
+    returned immediately; results for an already analyzed commit are reused.
     """
+    if background:
+        return await _queue_repository_analysis(http_request, background_tasks, request, project_intelligence, current_user)
+    
     try:
         logger.info(f"Starting repository analysis for {request.owner}/{request.repo} by user {current_user.user_id}")
         
@@ -84,7 +145,7 @@ async def analyze_repository(
         )
         
         logger.info(f"Repository analysis completed for {request.owner}/{request.repo}")
-        return RepositoryAnalysisResponse(**analysis_result)
+        return ORJSONResponse(analysis_result)
         
     except Exception as e:
         logger.error(f"Repository analysis failed for {request.owner}/{request.repo}: {e}")
@@ -93,12 +154,78 @@ async def analyze_repository(
             detail=f"Repository analysis failed: {str(e)}"
         )
 
-@router.post("/detect-technologies", response_model=TechnologyDetectionResponse)
+async def _queue_repository_analysis(
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    request: RepositoryAnalysisRequest,
+    project_intelligence: ProjectIntelligence,
+    current_user: TokenData
+) -> ORJSONResponse:
+    """Create an analysis job, reusing a stored result for the same commit when there is one"""
+    job_service = get_analysis_job_service(http_request)
+    
+    try:
+        head_sha = await project_intelligence.github_service.get_head_sha(
+            request.github_token, request.owner, request.repo
+        )
+    except Exception as e:
+        logger.error(f"Could not resolve HEAD for {request.owner}/{request.repo}: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Repository analysis failed: {str(e)}"
+        )
+    
+    cached_result = await job_service.find_completed_result(request.owner, request.repo, head_sha)
+    if cached_result is not None:
+        job_id = await job_service.create_completed_job(
+            current_user.user_id, request.owner, request.repo, head_sha, cached_result
+        )
+        status = "completed"
+    else:
+        job_id = await job_service.create_job(current_user.user_id, request.owner, request.repo, head_sha)
+        # The token is handed to the task in memory only; it is never stored on the job
+        background_tasks.add_task(
+            _run_analysis_job,
+            job_id,
+            job_service,
+            project_intelligence,
+            request.github_token,
+            request.owner,
+            request.repo
+        )
+        status = "pending"
+    
+    return ORJSONResponse(
+        {"job_id": job_id, "status": status, "status_url": _job_status_url(http_request, job_id)},
+        status_code=202
+    )
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJobResponse)
+async def get_analysis_job(
+    request: Request,
+    job_id: str,
+    job_service: AnalysisJobService = Depends(get_analysis_job_service),
+    current_user: TokenData = Depends(get_current_active_user)
+) -> ORJSONResponse:
+    """Get the status of a queued repository analysis, including the result once completed"""
+    job = await job_service.get_job(job_id, current_user.user_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Analysis job not found")
+    
+    return ORJSONResponse({
+        "job_id": job["_id"],
+        "status": job["status"],
+        "status_url": _job_status_url(request, job["_id"]),
+        "result": job.get("result"),
+        "error": job.get("error")
+    })
+
+@router.post("/detect-technologies", responses={200: {"model": TechnologyDetectionResponse}})
 async def detect_technologies(
-    request: TechnologyDetectionRequest,
+    request: TechnologyDetectionRequest = Depends(msgspec_body(TechnologyDetectionRequest)),
     project_intelligence: ProjectIntelligence = Depends(get_project_intelligence),
     current_user: TokenData = Depends(get_current_active_user)
-):
+) -> ORJSONResponse:
     """
     Detect technologies and frameworks used in a repository.
     Lighter version of full analysis focusing only on technology detection.
@@ -107,8 +234,7 @@ async def detect_technologies(
         logger.info(f"Detecting technologies for {request.owner}/{request.repo}")
         
         # Get repository structure
-        github_service = GitHubService()
-        structure = await github_service.analyze_repository_structure(
+        structure = await project_intelligence.get_repository_structure(
             request.github_token, request.owner, request.repo
         )
         
@@ -118,7 +244,7 @@ async def detect_technologies(
         )
         
         logger.info(f"Technology detection completed for {request.owner}/{request.repo}")
-        return TechnologyDetectionResponse(**technologies)
+        return ORJSONResponse(technologies)
         
     except Exception as e:
         logger.error(f"Technology detection failed for {request.owner}/{request.repo}: {e}")
@@ -127,12 +253,12 @@ async def detect_technologies(
             detail=f"Technology detection failed: {str(e)}"
         )
 
-@router.post("/recommend-agents", response_model=AgentRecommendationResponse)
+@router.post("/recommend-agents", responses={200: {"model": AgentRecommendationResponse}})
 async def recommend_agents(
-    request: AgentRecommendationRequest,
+    request: AgentRecommendationRequest = Depends(msgspec_body(AgentRecommendationRequest)),
     project_intelligence: ProjectIntelligence = Depends(get_project_intelligence),
     current_user: TokenData = Depends(get_current_active_user)
-):
+) -> ORJSONResponse:
     """
     Generate AI agent recommendations based on repository analysis.
     Can accept pre-analyzed repository data to avoid re-analysis.
@@ -140,41 +266,11 @@ async def recommend_agents(
     try:
         logger.info(f"Generating agent recommendations for user {current_user.user_id}")
         
-        analysis_data = request.repository_analysis
-        technologies = analysis_data.get("technologies", {})
-        code_patterns = analysis_data.get("code_patterns", {})
-        complexity = analysis_data.get("complexity", {})
-        
-        # Generate agent recommendations
-        agent_recommendations = project_intelligence._generate_agent_recommendations(
-            technologies, code_patterns
-        )
-        
-        # Generate workflow suggestions based on recommendations and user goals
-        workflow_suggestions = _generate_workflow_suggestions(
-            agent_recommendations,
-            request.project_goals or [],
-            complexity
-        )
-        
-        # Estimate timeline
-        estimated_timeline = _estimate_project_timeline(
-            agent_recommendations, 
-            complexity,
-            request.user_preferences or {}
-        )
-        
-        # Calculate confidence
-        confidence_score = project_intelligence._calculate_confidence_score(
-            technologies, code_patterns
-        )
-        
-        response = AgentRecommendationResponse(
-            recommendations=agent_recommendations,
-            workflow_suggestions=workflow_suggestions,
-            estimated_timeline=estimated_timeline,
-            confidence_score=confidence_score
-        )
+        response = ORJSONResponse(_analyze_once(
+            project_intelligence,
+            request.repository_analysis,
+            request.project_goals or []
+        ))
         
         logger.info(f"Agent recommendations generated for user {current_user.user_id}")
         return response
@@ -186,6 +282,117 @@ async def recommend_agents(
             detail=f"Agent recommendation failed: {str(e)}"
         )
 
+# Static agent catalog. This would typically come from a database or configuration;
+# for now it is a structured catalog based on our recommendations
+AGENT_CATALOG: Dict[str, List[Dict[str, Any]]] = {
+    "Engineering": [
+        {
+            "id": "frontend-developer",
+            "name": "Frontend Developer",
+            "description": "Specializes in UI/UX implementation, responsive design, and modern frontend frameworks",
+            "technologies": ["react", "vue", "angular", "nextjs", "svelte"],
+            "capabilities": ["component development", "styling", "performance optimization", "accessibility"],
+            "estimated_hourly_rate": "2-4 hours per feature"
+        },
+        {
+            "id": "backend-developer", 
+            "name": "Backend Developer",
+            "description": "Focuses on server-side logic, APIs, and data management",
+            "technologies": ["fastapi", "django", "flask", "expressjs", "nestjs"],
+            "capabilities": ["API design", "database integration", "security", "performance"],
+            "estimated_hourly_rate": "3-6 hours per endpoint"
+        },
+        {
+            "id": "fullstack-developer",
+            "name": "Fullstack Developer", 
+            "description": "End-to-end development across frontend and backend",
+            "technologies": ["react", "nextjs", "fastapi", "django", "postgresql"],
+            "capabilities": ["complete feature development", "integration", "deployment"],
+            "estimated_hourly_rate": "4-8 hours per feature"
+        }
+    ],
+    "Testing": [
+        {
+            "id": "test-automation-engineer",
+            "name": "Test Automation Engineer",
+            "description": "Implements comprehensive testing strategies and automation",
+            "technologies": ["jest", "pytest", "cypress", "selenium"],
+            "capabilities": ["unit testing", "integration testing", "test automation", "CI/CD integration"],
+            "estimated_hourly_rate": "2-4 hours per test suite"
+        },
+        {
+            "id": "qa-specialist",
+            "name": "QA Specialist",
+            "description": "Quality assurance and manual testing expertise",
+            "technologies": ["manual testing", "automated testing", "performance testing"],
+            "capabilities": ["test planning", "bug reporting", "quality metrics"],
+            "estimated_hourly_rate": "1-3 hours per feature"
+        }
+    ],
+    "Operations": [
+        {
+            "id": "devops-engineer",
+            "name": "DevOps Engineer", 
+            "description": "Infrastructure, deployment, and operations automation",
+            "technologies": ["docker", "kubernetes", "terraform", "aws", "gcp"],
+            "capabilities": ["CI/CD pipelines", "infrastructure as code", "monitoring", "scaling"],
+            "estimated_hourly_rate": "3-8 hours per environment"
+        },
+        {
+            "id": "deployment-specialist",
+            "name": "Deployment Specialist",
+            "description": "Focuses on deployment strategies and production readiness",
+            "technologies": ["docker", "kubernetes", "cloud platforms"],
+            "capabilities": ["deployment automation", "rollback strategies", "monitoring"],
+            "estimated_hourly_rate": "2-5 hours per deployment"
+        }
+    ],
+    "Design": [
+        {
+            "id": "ui-designer",
+            "name": "UI Designer",
+            "description": "User interface design and visual consistency",
+            "technologies": ["css", "tailwind", "styled-components", "sass"],
+            "capabilities": ["visual design", "component libraries", "responsive design"],
+            "estimated_hourly_rate": "2-6 hours per screen"
+        }
+    ]
+}
+
+def _build_tech_index() -> Dict[str, List[Tuple[str, int]]]:
+    """Map each lowercase technology to its (category, agent index) pairs, in catalog order."""
+    index = defaultdict(list)
+    for category, agents in AGENT_CATALOG.items():
+        for idx, agent in enumerate(agents):
+            for tech in {tech.lower() for tech in agent.get("technologies", [])}:
+                index[tech].append((category, idx))
+    return dict(index)
+
+TECH_INDEX = _build_tech_index()
+
+@lru_cache(maxsize=128)
+def _filtered_catalog_bytes(category: Optional[str], technology: Optional[str]) -> bytes:
+    """Serialize the agent catalog for a (category, technology) filter, cached per filter."""
+    agent_catalog = AGENT_CATALOG
+    
+    # Filter by category if specified
+    if category:
+        agent_catalog = {category: agent_catalog.get(category, [])}
+    
+    # Filter by technology if specified
+    if technology:
+        filtered_catalog = {}
+        for cat, idx in TECH_INDEX.get(technology.lower(), ()):
+            if cat in agent_catalog:
+                filtered_catalog.setdefault(cat, []).append(AGENT_CATALOG[cat][idx])
+        agent_catalog = filtered_catalog
+    
+    return orjson.dumps({
+        "categories": list(agent_catalog.keys()),
+        "agents": agent_catalog,
+        "total_agents": sum(len(agents) for agents in agent_catalog.values())
+    })
+
 @router.get("/agent-catalog")
 async def get_agent_catalog(
     category: Optional[str] = None,
@@ -197,106 +404,7 @@ async def get_agent_catalog(
     Can be filtered by category or technology.
     """
     try:
-        # This would typically come from a database or configuration
-        # For now, we'll return a structured catalog based on our recommendations
-        project_intelligence = ProjectIntelligence()
-        
-        agent_catalog = {
-            "Engineering": [
-                {
-                    "id": "frontend-developer",
-                    "name": "Frontend Developer",
-                    "description": "Specializes in UI/UX implementation, responsive design, and modern frontend frameworks",
-                    "technologies": ["react", "vue", "angular", "nextjs", "svelte"],
-                    "capabilities": ["component development", "styling", "performance optimization", "accessibility"],
-                    "estimated_hourly_rate": "2-4 hours per feature"
-                },
-                {
-                    "id": "backend-developer", 
-                    "name": "Backend Developer",
-                    "description": "Focuses on server-side logic, APIs, and data management",
-                    "technologies": ["fastapi", "django", "flask", "expressjs", "nestjs"],
-                    "capabilities": ["API design", "database integration", "security", "performance"],
-                    "estimated_hourly_rate": "3-6 hours per endpoint"
-                },
-                {
-                    "id": "fullstack-developer",
-                    "name": "Fullstack Developer", 
-                    "description": "End-to-end development across frontend and backend",
-                    "technologies": ["react", "nextjs", "fastapi", "django", "postgresql"],
-                    "capabilities": ["complete feature development", "integration", "deployment"],
-                    "estimated_hourly_rate": "4-8 hours per feature"
-                }
-            ],
-            "Testing": [
-                {
-                    "id": "test-automation-engineer",
-                    "name": "Test Automation Engineer",
-                    "description": "Implements comprehensive testing strategies and automation",
-                    "technologies": ["jest", "pytest", "cypress", "selenium"],
-                    "capabilities": ["unit testing", "integration testing", "test automation", "CI/CD integration"],
-                    "estimated_hourly_rate": "2-4 hours per test suite"
-                },
-                {
-                    "id": "qa-specialist",
-                    "name": "QA Specialist",
-                    "description": "Quality assurance and manual testing expertise",
-                    "technologies": ["manual testing", "automated testing", "performance testing"],
-                    "capabilities": ["test planning", "bug reporting", "quality metrics"],
-                    "estimated_hourly_rate": "1-3 hours per feature"
-                }
-            ],
-            "Operations": [
-                {
-                    "id": "devops-engineer",
-                    "name": "DevOps Engineer", 
-                    "description": "Infrastructure, deployment, and operations automation",
-                    "technologies": ["docker", "kubernetes", "terraform", "aws", "gcp"],
-                    "capabilities": ["CI/CD pipelines", "infrastructure as code", "monitoring", "scaling"],
-                    "estimated_hourly_rate": "3-8 hours per environment"
-                },
-                {
-                    "id": "deployment-specialist",
-                    "name": "Deployment Specialist",
-                    "description": "Focuses on deployment strategies and production readiness",
-                    "technologies": ["docker", "kubernetes", "cloud platforms"],
-                    "capabilities": ["deployment automation", "rollback strategies", "monitoring"],
-                    "estimated_hourly_rate": "2-5 hours per deployment"
-                }
-            ],
-            "Design": [
-                {
-                    "id": "ui-designer",
-                    "name": "UI Designer",
-                    "description": "User interface design and visual consistency",
-                    "technologies": ["css", "tailwind", "styled-components", "sass"],
-                    "capabilities": ["visual design", "component libraries", "responsive design"],
-                    "estimated_hourly_rate": "2-6 hours per screen"
-                }
-            ]
-        }
-        
-        # Filter by category if specified
-        if category:
-            agent_catalog = {category: agent_catalog.get(category, [])}
-        
-        # Filter by technology if specified
-        if technology:
-            filtered_catalog = {}
-            for cat, agents in agent_catalog.items():
-                filtered_agents = [
-                    agent for agent in agents 
-                    if technology.lower() in [tech.lower() for tech in agent.get("technologies", [])]
-                ]
-                if filtered_agents:
-                    filtered_catalog[cat] = filtered_agents
-            agent_catalog = filtered_catalog
-        
-        return {
-            "categories": list(agent_catalog.keys()),
-            "agents": agent_catalog,
-            "total_agents": sum(len(agents) for agents in agent_catalog.values())
-        }
+        return Response(_filtered_catalog_bytes(category, technology), media_type="application/json")
         
     except Exception as e:
         logger.error(f"Agent catalog retrieval failed: {e}")
@@ -305,16 +413,47 @@ async def get_agent_catalog(
             detail=f"Agent catalog retrieval failed: {str(e)}"
         )
 
+def _analyze_once(
+    project_intelligence: ProjectIntelligence,
+    analysis_data: Dict[str, Any],
+    project_goals: List[str]
+) -> Dict[str, Any]:
+    """
+    Build recommendations, workflow suggestions, timeline and confidence in one pass.
+    Each input dict is read once and the shared intermediates are reused by every output.
+    """
+    technologies = analysis_data.get("technologies", {})
+    code_patterns = analysis_data.get("code_patterns", {})
+    complexity = analysis_data.get("complexity", {})
+    
+    # Recommendations and confidence come from the same walk over detected technologies
+    agent_recommendations, confidence_score = project_intelligence._recommend_agents(
+        technologies, code_patterns
+    )
+    agent_ids = {rec["agent_id"] for rec in agent_recommendations}
+    
+    return {
+        "recommendations": agent_recommendations,
+        "workflow_suggestions": _generate_workflow_suggestions(agent_ids, project_goals, complexity),
+        # Only "more than one of the top 5 agents" affects the estimate (parallel work)
+        "estimated_timeline": _timeline_core(
+            len(agent_recommendations) > 1,
+            complexity.get("size_category", "medium"),
+            complexity.get("complexity_score", 0.5)
+        ),
+        "confidence_score": confidence_score
+    }
+
 def _generate_workflow_suggestions(
-    agent_recommendations: List[Dict[str, Any]],
+    agent_ids: Set[str],
     project_goals: List[str],
     complexity: Dict[str, Any]
 ) -> List[Dict[str, Any]]:
-    """Generate workflow suggestions based on agent recommendations and goals."""
+    """Generate workflow suggestions based on recommended agent ids and goals."""
     suggestions = []
     
     # Basic development workflow
-    if any("frontend-developer" in rec["agent_id"] for rec in agent_recommendations):
+    if "frontend-developer" in agent_ids:
         suggestions.append({
             "name": "Frontend Development Workflow",
             "description": "UI/UX development with modern frameworks",
@@ -324,7 +463,7 @@ def _generate_workflow_suggestions(
         })
     
     # Full-stack development workflow
-    if any("backend" in rec["agent_id"] for rec in agent_recommendations):
+    if any(agent_id.startswith("backend") for agent_id in agent_ids):
         suggestions.append({
             "name": "Full-Stack Development Workflow", 
             "description": "Complete application development",
@@ -355,28 +494,28 @@ def _generate_workflow_suggestions(
     
     return suggestions
 
-def _estimate_project_timeline(
-    agent_recommendations: List[Dict[str, Any]],
-    complexity: Dict[str, Any],
-    user_preferences: Dict[str, Any]
-) -> str:
-    """Estimate overall project timeline."""
-    complexity_score = complexity.get("complexity_score", 0.5)
-    agent_count = len(agent_recommendations[:5])  # Consider top 5 agents
-    
-    # Base estimates in days
-    base_estimates = {
-        "small": 3,
-        "medium": 7, 
-        "large": 14,
-        "enterprise": 30
-    }
-    
-    size_category = complexity.get("size_category", "medium")
-    base_days = base_estimates.get(size_category, 7)
+# Base estimates in days
+BASE_ESTIMATES = {
+    "small": 3,
+    "medium": 7,
+    "large": 14,
+    "enterprise": 30
+}
+
+# (upper bound in days, days per unit, unit) - day counts are shown as whole numbers
+TIMELINE_UNITS = (
+    (7, 1, "days"),
+    (21, 7, "weeks"),
+    (float("inf"), 30, "months")
+)
+
+@lru_cache(maxsize=4096)
+def _timeline_core(parallel_work: bool, size_category: str, complexity_score: float) -> str:
+    """Compute the timeline estimate; pure, so memoized on its inputs."""
+    base_days = BASE_ESTIMATES.get(size_category, 7)
     
     # Adjust for agent count (parallel work)
-    if agent_count > 1:
+    if parallel_work:
         parallel_factor = 0.7  # 30% reduction for parallel work
         adjusted_days = base_days * parallel_factor
     else:
@@ -386,11 +525,8 @@ def _estimate_project_timeline(
     complexity_multiplier = 1 + (complexity_score * 0.5)
     final_days = int(adjusted_days * complexity_multiplier)
     
-    if final_days <= 7:
-        return f"{final_days} days"
-    elif final_days <= 21:
-        weeks = final_days / 7
-        return f"{weeks:.1f} weeks"
-    else:
-        months = final_days / 30
-        return f"{months:.1f} months"
\ No newline at end of file
+    for max_days, days_per_unit, unit in TIMELINE_UNITS:
+        if final_days <= max_days:
+            if days_per_unit == 1:
+                return f"{final_days} {unit}"
+            return f"{final_days / days_per_unit:.1f} {unit}"
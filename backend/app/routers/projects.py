@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Dict, Optional, List
+from typing import Dict, Optional, List, Tuple
+import time
 
 from app.models.project import (
     ProjectCreate, 
@@ -14,20 +16,17 @@ from app.models.user import TokenData
 from app.services.project_service import ProjectService
 from app.middleware.auth import get_current_active_user, check_rate_limit
 from app.services.export_service import ExportService
+from app.config import settings
+from app.utils.request_body import ORJSONRoute
 
-router = APIRouter(prefix="/projects", tags=["projects"])
-
-
-async def get_db(request: Request) -> AsyncIOMotorDatabase:
-    """Dependency to get database instance"""
-    return request.app.state.db
+router = APIRouter(prefix="/projects", tags=["projects"], route_class=ORJSONRoute)
 
 
 @router.post("", response_model=Project)
 async def create_project(
+    request: Request,
     project_data: ProjectCreate,
-    current_user: TokenData = Depends(check_rate_limit),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: TokenData = Depends(check_rate_limit)
 ):
     """
     Create a new project
@@ -37,6 +36,7 @@ async def create_project(
     - **workflow**: Initial workflow configuration (optional)
     - **tags**: List of tags (optional)
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     project = await project_service.create_project(current_user.user_id, project_data)
     return project
@@ -44,40 +44,45 @@ async def create_project(
 
 @router.get("", response_model=ProjectList)
 async def list_projects(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=100),
     status: Optional[ProjectStatus] = None,
-    current_user: TokenData = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    current_user: TokenData = Depends(get_current_active_user)
 ):
     """
     List user's projects with pagination
     
-    - **skip**: Number of projects to skip
+    - **skip**: Number of projects to skip (ignored when a cursor is given)
     - **limit**: Maximum number of projects to return
     - **status**: Filter by project status (draft, active, archived)
+    - **cursor**: Continue after the previous page; cheaper than skip for deep pages (the response's page is then null)
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     result = await project_service.get_user_projects(
         current_user.user_id, 
         skip=skip, 
         limit=limit,
-        status_filter=status
+        status_filter=status,
+        page_cursor=cursor
     )
     return ProjectList(**result)
 
 
 @router.get("/templates", response_model=List[Project])
 async def list_templates(
+    request: Request,
     category: Optional[str] = None,
-    current_user: TokenData = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: TokenData = Depends(get_current_active_user)
 ):
     """
     List available project templates
     
     - **category**: Filter by template category (optional)
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     templates = await project_service.get_project_templates(category)
     return templates
@@ -85,15 +90,16 @@ async def list_templates(
 
 @router.get("/{project_id}", response_model=Project)
 async def get_project(
+    request: Request,
     project_id: str,
-    current_user: TokenData = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: TokenData = Depends(get_current_active_user)
 ):
     """
     Get a specific project by ID
     
     - **project_id**: The project ID
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     project = await project_service.get_project(project_id, current_user.user_id)
     return project
@@ -101,10 +107,10 @@ async def get_project(
 
 @router.put("/{project_id}", response_model=Project)
 async def update_project(
+    request: Request,
     project_id: str,
     project_update: ProjectUpdate,
-    current_user: TokenData = Depends(check_rate_limit),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: TokenData = Depends(check_rate_limit)
 ):
     """
     Update a project
@@ -115,6 +121,7 @@ async def update_project(
     - **workflow**: Updated workflow (optional)
     - **status**: New status (optional)
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     project = await project_service.update_project(
         project_id, 
@@ -126,15 +133,16 @@ async def update_project(
 
 @router.delete("/{project_id}")
 async def delete_project(
+    request: Request,
     project_id: str,
-    current_user: TokenData = Depends(get_current_active_user),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: TokenData = Depends(get_current_active_user)
 ):
     """
     Delete a project (soft delete)
     
     - **project_id**: The project ID
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     success = await project_service.delete_project(project_id, current_user.user_id)
     
@@ -149,15 +157,16 @@ async def delete_project(
 
 @router.post("/{project_id}/duplicate", response_model=Project)
 async def duplicate_project(
+    request: Request,
     project_id: str,
-    current_user: TokenData = Depends(check_rate_limit),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: TokenData = Depends(check_rate_limit)
 ):
     """
     Duplicate an existing project
     
     - **project_id**: The project ID to duplicate
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     new_project = await project_service.duplicate_project(project_id, current_user.user_id)
     return new_project
@@ -165,10 +174,10 @@ async def duplicate_project(
 
 @router.post("/from-template/{template_id}", response_model=Project)
 async def create_from_template(
+    request: Request,
     template_id: str,
     name: str,
-    current_user: TokenData = Depends(check_rate_limit),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    current_user: TokenData = Depends(check_rate_limit)
 ):
     """
     Create a new project from a template
@@ -176,6 +185,7 @@ async def create_from_template(
     - **template_id**: The template ID
     - **name**: Name for the new project
     """
+    db = request.app.state.db
     project_service = ProjectService(db)
     project = await project_service.create_project_from_template(
         template_id, 
@@ -185,13 +195,44 @@ async def create_from_template(
     return project
 
 
+# Export formats per user, derived from their subscription tier and kept briefly in memory
+EXPORT_FORMATS_CACHE_TTL_SECONDS = 60
+EXPORT_FORMATS_CACHE_MAX_ENTRIES = 10000
+_export_formats_cache: Dict[str, Tuple[List[str], float]] = {}  # user_id -> (formats, expires_at)
+
+
+async def _get_allowed_export_formats(db: AsyncIOMotorDatabase, user_id: str) -> List[str]:
+    """Get the export formats allowed by the user's subscription tier"""
+    cached = _export_formats_cache.get(user_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    
+    user = await db.users.find_one({"_id": user_id}, {"subscription.tier": 1})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    tier_limits = settings.tier_limits.get(user["subscription"]["tier"], {})
+    allowed_formats = tier_limits.get("export_formats", ["json"])
+    
+    if len(_export_formats_cache) >= EXPORT_FORMATS_CACHE_MAX_ENTRIES:
+        now = time.monotonic()
+        for key in [k for k, (_, expires_at) in _export_formats_cache.items() if expires_at <= now]:
+            del _export_formats_cache[key]
+        if len(_export_formats_cache) >= EXPORT_FORMATS_CACHE_MAX_ENTRIES:
+            _export_formats_cache.clear()
+    _export_formats_cache[user_id] = (allowed_formats, time.monotonic() + EXPORT_FORMATS_CACHE_TTL_SECONDS)
+    
+    return allowed_formats
+
+
 @router.post("/{project_id}/export/{format}")
 async def export_project(
+    request: Request,
     project_id: str,
     format: str,
     export_options: ProjectExport,
-    current_user: TokenData = Depends(check_rate_limit),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    current_user: TokenData = Depends(check_rate_limit)
 ):
     """
     Export a project in the specified format
@@ -201,14 +242,9 @@ async def export_project(
     - **include_readme**: Include README file
     - **include_env_template**: Include .env.example file
     """
+    db = request.app.state.db
     # Check if user's tier allows this export format
-    from app.config import settings
-    user = await db.users.find_one({"_id": current_user.user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    tier_limits = settings.tier_limits.get(user["subscription"]["tier"], {})
-    allowed_formats = tier_limits.get("export_formats", ["json"])
+    allowed_formats = await _get_allowed_export_formats(db, current_user.user_id)
     
     if format not in allowed_formats:
         raise HTTPException(
@@ -222,9 +258,9 @@ async def export_project(
     
     # Export project
     export_service = ExportService()
-    export_data = await export_service.export_project(project, export_options)
+    export_body = await export_service.export_project_stream(project, export_options)
     
-    # Record export
-    await project_service.record_export(project_id, current_user.user_id, format)
+    # Record export after the response has been sent
+    background_tasks.add_task(project_service.record_export, project_id, current_user.user_id, format)
     
-    return export_data
\ No newline at end of file
+    return StreamingResponse(export_body, media_type="application/json")
\ No newline at end of file
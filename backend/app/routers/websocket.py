@@ -1,64 +1,133 @@
-import json
+import asyncio
+import itertools
 import logging
+import orjson
 from typing import Dict, Any
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
-from datetime import datetime
+from pydantic import ValidationError
 
 from app.models.execution import (
     ControlMessage, ControlMessageType, StartExecutionControl,
     ExecutionCreate, WebSocketMessage, MessageType, ErrorMessage
 )
-from app.services.execution_service import ExecutionService
+from app.services.execution_service import ExecutionService, encode_update
 from app.utils.security import decode_token
+from app.utils.clock import CLOCK
 from app.models.user import TokenData
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+def _json_default(obj: Any) -> str:
+    """Fallback for values orjson cannot serialize natively (e.g. ObjectId)"""
+    return str(obj)
+
+async def _send_json(websocket: WebSocket, message: Any):
+    """Send a message as an orjson-encoded text frame (clients JSON.parse text frames)"""
+    await websocket.send_text(orjson.dumps(message, default=_json_default).decode())
+
+# Execution updates arrive already encoded (see encode_update) and are queued per connection
+# for a dedicated writer task, which joins whatever arrives within the flush interval (up to
+# this many) into one frame
+BATCH_FLUSH_INTERVAL_SECONDS = 0.02
+MAX_BATCH_MESSAGES = 128
+# Updates a slow client may fall behind by before the oldest ones are dropped
+MAX_QUEUED_MESSAGES = 1024
+
 class WebSocketManager:
     def __init__(self):
-        self.active_connections: Dict[str, WebSocket] = {}
-        self.execution_connections: Dict[str, str] = {}  # execution_id -> connection_id
+        # Connections are keyed by small integer ids; the readable label is kept for logs only
+        self._connection_ids = itertools.count(1)
+        self.connection_labels: Dict[int, str] = {}  # connection_id -> log label
+        self.active_connections: Dict[int, WebSocket] = {}
+        self.execution_connections: Dict[str, int] = {}  # execution_id -> connection_id
+        self.connection_to_execution: Dict[int, str] = {}  # connection_id -> execution_id
+        self.outbound_queues: Dict[int, asyncio.Queue] = {}  # connection_id -> unsent encoded messages
+        self.writer_tasks: Dict[int, asyncio.Task] = {}  # connection_id -> queue writer
     
-    async def connect(self, websocket: WebSocket, connection_id: str, execution_id: str = None):
+    def next_connection_id(self) -> int:
+        """Allocate an id for a new connection"""
+        return next(self._connection_ids)
+    
+    async def connect(self, websocket: WebSocket, connection_id: int, execution_id: str = None, label: str = None):
         await websocket.accept()
+        label = label or str(connection_id)
+        self.connection_labels[connection_id] = label
         self.active_connections[connection_id] = websocket
         if execution_id:
             self.execution_connections[execution_id] = connection_id
-        logger.info(f"WebSocket connected: {connection_id}")
+            self.connection_to_execution[connection_id] = execution_id
+        
+        queue = asyncio.Queue(maxsize=MAX_QUEUED_MESSAGES)
+        self.outbound_queues[connection_id] = queue
+        self.writer_tasks[connection_id] = asyncio.create_task(self._writer(connection_id, websocket, queue))
+        logger.info(f"WebSocket connected: {label}")
     
-    def disconnect(self, connection_id: str):
+    def disconnect(self, connection_id: int):
+        # Stop the writer and drop anything still queued for this connection
+        writer_task = self.writer_tasks.pop(connection_id, None)
+        if writer_task and writer_task is not asyncio.current_task():
+            writer_task.cancel()
+        self.outbound_queues.pop(connection_id, None)
+        label = self.connection_labels.pop(connection_id, connection_id)
+        
         if connection_id in self.active_connections:
-            # Find and remove execution connection
-            execution_id = None
-            for exec_id, conn_id in self.execution_connections.items():
-                if conn_id == connection_id:
-                    execution_id = exec_id
-                    break
-            
-            if execution_id:
+            # Remove execution connection, unless a newer connection has taken it over
+            execution_id = self.connection_to_execution.pop(connection_id, None)
+            if execution_id and self.execution_connections.get(execution_id) == connection_id:
                 del self.execution_connections[execution_id]
             
             del self.active_connections[connection_id]
-            logger.info(f"WebSocket disconnected: {connection_id}")
+            logger.info(f"WebSocket disconnected: {label}")
     
-    async def send_message(self, connection_id: str, message: Dict[str, Any]):
-        if connection_id in self.active_connections:
-            websocket = self.active_connections[connection_id]
+    async def stop_writer(self, connection_id: int):
+        """Stop the connection's writer and wait for it, leaving the socket free for a direct send"""
+        writer_task = self.writer_tasks.pop(connection_id, None)
+        if writer_task and writer_task is not asyncio.current_task():
+            writer_task.cancel()
+            await asyncio.gather(writer_task, return_exceptions=True)
+    
+    async def send_message(self, connection_id: int, message: str):
+        """Queue an encoded message for the connection's writer; never waits on the socket"""
+        queue = self.outbound_queues.get(connection_id)
+        if queue is None:
+            return
+        
+        if queue.full():
+            # The client is not keeping up: drop the oldest update rather than block the producer
+            queue.get_nowait()
+            logger.warning(f"Dropping oldest queued message for slow WebSocket {self.connection_labels.get(connection_id)}")
+        queue.put_nowait(message)
+    
+    async def _writer(self, connection_id: int, websocket: WebSocket, queue: asyncio.Queue):
+        """Drain the queue, sending each batch as one text frame: a single message as is, several as an array"""
+        while True:
+            batch = [await queue.get()]
+            if queue.qsize() < MAX_BATCH_MESSAGES - 1:
+                # Give a burst of updates a moment to arrive so they share the frame
+                await asyncio.sleep(BATCH_FLUSH_INTERVAL_SECONDS)
+            while len(batch) < MAX_BATCH_MESSAGES and not queue.empty():
+                batch.append(queue.get_nowait())
+            
             try:
-                await websocket.send_json(message)
+                await websocket.send_text(batch[0] if len(batch) == 1 else "[" + ",".join(batch) + "]")
             except Exception as e:
-                logger.error(f"Error sending message to {connection_id}: {e}")
+                logger.error(f"Error sending message to {self.connection_labels.get(connection_id)}: {e}")
                 self.disconnect(connection_id)
+                return
     
     async def send_to_execution(self, execution_id: str, message: Dict[str, Any]):
         if execution_id in self.execution_connections:
             connection_id = self.execution_connections[execution_id]
-            await self.send_message(connection_id, message)
+            await self.send_message(connection_id, encode_update(message))
 
 # Global WebSocket manager
 websocket_manager = WebSocketManager()
 
+async def _reply(connection_id: int, message: Any):
+    """Queue a reply behind the updates already queued for the connection's writer"""
+    await websocket_manager.send_message(connection_id, orjson.dumps(message, default=_json_default).decode())
+
 # Global execution service instance - will be initialized by the main app
 execution_service_instance = None
 
@@ -103,76 +172,83 @@ async def websocket_execution_endpoint(
         await websocket.close(code=4001, reason="Authentication failed")
         return
     
-    # Generate connection ID
-    connection_id = f"{user_id}_{execution_id}_{datetime.utcnow().timestamp()}"
+    # Allocate connection ID; the readable label is only used in logs and the handshake reply
+    connection_id = websocket_manager.next_connection_id()
+    connection_label = f"{user_id}_{execution_id}_{connection_id}"
     
     # Connect WebSocket
-    await websocket_manager.connect(websocket, connection_id, execution_id)
+    await websocket_manager.connect(websocket, connection_id, execution_id, label=connection_label)
     
     # Get execution service
     execution_service = get_execution_service()
     
     try:
         # Register WebSocket handler for execution updates
-        async def websocket_handler(message: Dict[str, Any]):
-            await websocket_manager.send_message(connection_id, {
-                "type": message.get("type", "unknown"),
-                "data": message,
-                "timestamp": datetime.utcnow().isoformat()
-            })
+        async def websocket_handler(message: str):
+            await websocket_manager.send_message(connection_id, message)
         
-        if execution_service:
-            await execution_service.register_websocket_handler(execution_id, websocket_handler)
+        if execution_service and not await execution_service.register_websocket_handler(execution_id, websocket_handler):
+            # Too many subscribers for this execution; ask the client to retry later
+            await websocket.close(code=1013, reason="Too many connections for this execution")
+            return
         
         # Send initial connection confirmation
-        await websocket.send_json({
+        await _reply(connection_id, {
             "type": "connected",
             "execution_id": execution_id,
-            "connection_id": connection_id,
-            "timestamp": datetime.utcnow().isoformat()
+            "connection_id": connection_label,
+            "timestamp": CLOCK.isoformat()
         })
         
         # Main message loop
         while True:
+            # Receive message from client
+            data = await websocket.receive_text()
+            
+            # Parse and validate the control message straight from the raw JSON
             try:
-                # Receive message from client
-                data = await websocket.receive_text()
-                message_data = json.loads(data)
-                
-                # Parse control message
-                try:
-                    control_message = ControlMessage(**message_data)
-                    await handle_control_message(
-                        control_message, 
-                        execution_id, 
-                        user_id, 
-                        execution_service,
-                        websocket
-                    )
-                except Exception as e:
+                control_message = ControlMessage.model_validate_json(data)
+            except ValidationError as e:
+                if any(error["type"] == "json_invalid" for error in e.errors()):
+                    error_message = "Invalid JSON format"
+                else:
                     logger.error(f"Error parsing control message: {e}")
-                    await websocket.send_json({
-                        "type": "error",
-                        "error": f"Invalid message format: {str(e)}",
-                        "timestamp": datetime.utcnow().isoformat()
-                    })
-                    
-            except json.JSONDecodeError:
-                await websocket.send_json({
+                    error_message = f"Invalid message format: {str(e)}"
+                await _reply(connection_id, {
                     "type": "error",
-                    "error": "Invalid JSON format",
-                    "timestamp": datetime.utcnow().isoformat()
+                    "error": error_message,
+                    "timestamp": CLOCK.isoformat()
+                })
+                continue
+            
+            try:
+                await handle_control_message(
+                    control_message, 
+                    execution_id, 
+                    user_id, 
+                    execution_service,
+                    connection_id
+                )
+            except Exception as e:
+                logger.error(f"Error handling control message: {e}")
+                await _reply(connection_id, {
+                    "type": "error",
+                    "error": f"Invalid message format: {str(e)}",
+                    "timestamp": CLOCK.isoformat()
                 })
                 
     except WebSocketDisconnect:
-        logger.info(f"Execution WebSocket disconnected: {connection_id}")
+        logger.info(f"Execution WebSocket disconnected: {connection_label}")
     except Exception as e:
         logger.error(f"Execution WebSocket error: {e}")
         try:
-            await websocket.send_json({
+            # The connection is closing, so the queued updates are moot; stop the writer
+            # so this last reply is the socket's only sender
+            await websocket_manager.stop_writer(connection_id)
+            await _send_json(websocket, {
                 "type": "error",
                 "error": str(e),
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": CLOCK.isoformat()
             })
         except:
             pass
@@ -182,100 +258,103 @@ async def websocket_execution_endpoint(
         if execution_service:
             await execution_service.unregister_websocket_handler(execution_id, websocket_handler)
 
+# Controls that call one ExecutionService method and acknowledge success or failure:
+# type -> (service method, acknowledgement type, failure message)
+_ACKNOWLEDGED_CONTROLS = {
+    ControlMessageType.PAUSE_EXECUTION: ("pause_execution", "pause_acknowledged", "Failed to pause execution"),
+    ControlMessageType.RESUME_EXECUTION: ("resume_execution", "resume_acknowledged", "Failed to resume execution"),
+    ControlMessageType.CANCEL_EXECUTION: ("cancel_execution", "cancel_acknowledged", "Failed to cancel execution")
+}
+
+def _acknowledgement(ack_type: str, success: bool, failure_message: str, ts: str) -> Dict[str, Any]:
+    """Build the reply for a control message that either succeeds or fails"""
+    return {
+        "type": ack_type if success else "error",
+        "error": None if success else failure_message,
+        "timestamp": ts
+    }
+
 async def handle_control_message(
     control_message: ControlMessage,
     execution_id: str,
     user_id: str,
     execution_service: ExecutionService,
-    websocket: WebSocket
+    connection_id: int
 ):
-    """Handle control messages from the client"""
+    """Handle control messages from the client; replies go through the connection's writer"""
+    # One timestamp per control message, shared by every reply it produces
+    ts = CLOCK.isoformat()
     
     if not execution_service:
-        await websocket.send_json({
+        await _reply(connection_id, {
             "type": "error",
             "error": "Execution service not available",
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": ts
         })
         return
     
     try:
-        if control_message.type == ControlMessageType.START_EXECUTION:
+        acknowledged_control = _ACKNOWLEDGED_CONTROLS.get(control_message.type)
+        if acknowledged_control:
+            method_name, ack_type, failure_message = acknowledged_control
+            success = await getattr(execution_service, method_name)(execution_id)
+            await _reply(connection_id, _acknowledgement(ack_type, success, failure_message, ts))
+        
+        elif control_message.type == ControlMessageType.START_EXECUTION:
             # Start execution
             workflow_data = control_message.data or {}
             success = await execution_service.start_execution(execution_id, workflow_data)
             
             if success:
-                await websocket.send_json({
+                await _reply(connection_id, {
                     "type": "execution_start_acknowledged",
                     "execution_id": execution_id,
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": ts
                 })
             else:
-                await websocket.send_json({
+                await _reply(connection_id, {
                     "type": "error",
                     "error": "Failed to start execution",
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": ts
                 })
         
-        elif control_message.type == ControlMessageType.PAUSE_EXECUTION:
-            success = await execution_service.pause_execution(execution_id)
-            await websocket.send_json({
-                "type": "pause_acknowledged" if success else "error",
-                "error": None if success else "Failed to pause execution",
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        
-        elif control_message.type == ControlMessageType.RESUME_EXECUTION:
-            success = await execution_service.resume_execution(execution_id)
-            await websocket.send_json({
-                "type": "resume_acknowledged" if success else "error",
-                "error": None if success else "Failed to resume execution",
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        
-        elif control_message.type == ControlMessageType.CANCEL_EXECUTION:
-            success = await execution_service.cancel_execution(execution_id)
-            await websocket.send_json({
-                "type": "cancel_acknowledged" if success else "error",
-                "error": None if success else "Failed to cancel execution",
-                "timestamp": datetime.utcnow().isoformat()
-            })
-        
         elif control_message.type == ControlMessageType.GET_STATUS:
             execution = await execution_service.get_execution(execution_id, user_id)
             if execution:
-                await websocket.send_json({
-                    "type": "status_response",
-                    "execution": execution.dict(),
-                    "timestamp": datetime.utcnow().isoformat()
-                })
+                # Serialize the model straight to JSON and splice it into the reply,
+                # skipping the intermediate dict
+                await websocket_manager.send_message(
+                    connection_id,
+                    '{"type":"status_response","execution":'
+                    + execution.model_dump_json()
+                    + f',"timestamp":"{ts}"}}'
+                )
             else:
-                await websocket.send_json({
+                await _reply(connection_id, {
                     "type": "error",
                     "error": "Execution not found",
-                    "timestamp": datetime.utcnow().isoformat()
+                    "timestamp": ts
                 })
         
         elif control_message.type == ControlMessageType.PING:
-            await websocket.send_json({
+            await _reply(connection_id, {
                 "type": "pong",
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": ts
             })
         
         else:
-            await websocket.send_json({
+            await _reply(connection_id, {
                 "type": "error",
                 "error": f"Unknown control message type: {control_message.type}",
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": ts
             })
             
     except Exception as e:
         logger.error(f"Error handling control message: {e}")
-        await websocket.send_json({
+        await _reply(connection_id, {
             "type": "error",
             "error": str(e),
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": ts
         })
 
 # Export the websocket manager for use in other modules
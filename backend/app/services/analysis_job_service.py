@@ -0,0 +1,76 @@
+import uuid
+import logging
+from typing import Optional, Dict, Any
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+# Jobs (and their results) are removed by a TTL index on created_at after this long
+ANALYSIS_JOB_TTL_SECONDS = 3600
+
+
+class AnalysisJobService:
+    """Tracks background repository analyses so clients can poll for the result"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.jobs_collection = db.repository_analysis_jobs
+
+    async def create_job(self, user_id: str, owner: str, repo: str, head_sha: str) -> str:
+        """Create a pending analysis job and return its id"""
+        now = datetime.utcnow()
+        job_id = str(uuid.uuid4())
+        await self.jobs_collection.insert_one({
+            "_id": job_id,
+            "user_id": user_id,
+            "owner": owner.lower(),
+            "repo": repo.lower(),
+            "head_sha": head_sha,
+            "status": "pending",
+            "created_at": now,
+            "updated_at": now
+        })
+        logger.info(f"Created analysis job {job_id} for {owner}/{repo} by user {user_id}")
+        return job_id
+
+    async def create_completed_job(
+        self,
+        user_id: str,
+        owner: str,
+        repo: str,
+        head_sha: str,
+        result: Dict[str, Any]
+    ) -> str:
+        """Create a job that already holds a result (e.g. reused for the same commit)"""
+        job_id = await self.create_job(user_id, owner, repo, head_sha)
+        await self.complete_job(job_id, result)
+        return job_id
+
+    async def get_job(self, job_id: str, user_id: str) -> Optional[Dict[str, Any]]:
+        """Get a job by ID, ensuring user ownership"""
+        return await self.jobs_collection.find_one({"_id": job_id, "user_id": user_id})
+
+    async def find_completed_result(self, owner: str, repo: str, head_sha: str) -> Optional[Dict[str, Any]]:
+        """Get the result of a finished analysis of the same commit, if one is still stored"""
+        job = await self.jobs_collection.find_one(
+            {"owner": owner.lower(), "repo": repo.lower(), "head_sha": head_sha, "status": "completed"},
+            {"result": 1}
+        )
+        return job["result"] if job else None
+
+    async def mark_running(self, job_id: str) -> None:
+        """Mark a job as running"""
+        await self._set(job_id, {"status": "running"})
+
+    async def complete_job(self, job_id: str, result: Dict[str, Any]) -> None:
+        """Store the analysis result"""
+        await self._set(job_id, {"status": "completed", "result": result})
+
+    async def fail_job(self, job_id: str, error: str) -> None:
+        """Record why the analysis failed"""
+        await self._set(job_id, {"status": "failed", "error": error})
+
+    async def _set(self, job_id: str, fields: Dict[str, Any]) -> None:
+        fields["updated_at"] = datetime.utcnow()
+        await self.jobs_collection.update_one({"_id": job_id}, {"$set": fields})
@@ -1,21 +1,38 @@
 from typing import Optional
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
 from fastapi import HTTPException, status
+from pymongo.errors import DuplicateKeyError
 import logging
 
 from app.models.user import UserCreate, UserInDB, UserLogin, UserTier
 from app.utils.security import (
-    verify_password, 
-    get_password_hash, 
+    verify_password_async,
+    get_password_hash_async,
     create_tokens,
     generate_verification_token,
     generate_password_reset_token
 )
 from app.config import settings
+from app.utils.clock import CLOCK
 
 logger = logging.getLogger(__name__)
 
+# Fields of the user returned alongside tokens by register_user and login_user
+USER_RESPONSE_FIELDS = {"id", "email", "first_name", "last_name", "is_verified", "subscription"}
+
+# Fields read by login_user; the rest of the user document is not needed to log in
+LOGIN_PROJECTION = {
+    "email": 1,
+    "hashed_password": 1,
+    "is_active": 1,
+    "is_verified": 1,
+    "first_name": 1,
+    "last_name": 1,
+    "subscription": 1
+}
+
 
 class AuthService:
     def __init__(self, db: AsyncIOMotorDatabase):
@@ -24,30 +41,37 @@ class AuthService:
         
     async def register_user(self, user_data: UserCreate) -> dict:
         """Register a new user"""
-        # Check if user already exists
-        existing_user = await self.users_collection.find_one({"email": user_data.email})
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail="User with this email already exists"
-            )
-        
         # Create user document
         user_dict = user_data.model_dump()
         user_dict.pop("password")
         
+        now = CLOCK.now()
         user_in_db = UserInDB(
             **user_dict,
-            _id=str(datetime.utcnow().timestamp()).replace(".", ""),
-            hashed_password=get_password_hash(user_data.password),
+            _id=str(ObjectId()),
+            hashed_password=await get_password_hash_async(user_data.password),
             email_verification_token=generate_verification_token(),
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
+            created_at=now,
+            updated_at=now
         )
         
-        # Insert user into database
+        # Insert the user only if the email is free, in a single round trip. Concurrent
+        # upserts of the same email are rejected by the unique email index.
         user_doc = user_in_db.model_dump(by_alias=True)
-        await self.users_collection.insert_one(user_doc)
+        try:
+            result = await self.users_collection.update_one(
+                {"email": user_in_db.email},
+                {"$setOnInsert": user_doc},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            result = None
+        
+        if result is None or result.upserted_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="User with this email already exists"
+            )
         
         # Create tokens
         tokens = create_tokens(
@@ -60,21 +84,17 @@ class AuthService:
         logger.info(f"User registered: {user_in_db.email}")
         
         return {
-            "user": {
-                "id": user_in_db.id,
-                "email": user_in_db.email,
-                "first_name": user_in_db.first_name,
-                "last_name": user_in_db.last_name,
-                "is_verified": user_in_db.is_verified,
-                "subscription": user_in_db.subscription.model_dump()
-            },
+            "user": user_in_db.model_dump(include=USER_RESPONSE_FIELDS),
             **tokens
         }
     
     async def login_user(self, login_data: UserLogin) -> dict:
         """Authenticate user and return tokens"""
-        # Find user
-        user_doc = await self.users_collection.find_one({"email": login_data.email})
+        # Find user, fetching only the fields login needs
+        user_doc = await self.users_collection.find_one(
+            {"email": login_data.email},
+            LOGIN_PROJECTION
+        )
         if not user_doc:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
@@ -84,7 +104,7 @@ class AuthService:
         user = UserInDB(**user_doc)
         
         # Verify password
-        if not verify_password(login_data.password, user.hashed_password):
+        if not await verify_password_async(login_data.password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect email or password"
@@ -100,7 +120,7 @@ class AuthService:
         # Update last login
         await self.users_collection.update_one(
             {"_id": user.id},
-            {"$set": {"last_login": datetime.utcnow()}}
+            {"$set": {"last_login": CLOCK.now()}}
         )
         
         # Create tokens
@@ -111,14 +131,7 @@ class AuthService:
         )
         
         return {
-            "user": {
-                "id": user.id,
-                "email": user.email,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "is_verified": user.is_verified,
-                "subscription": user.subscription.model_dump()
-            },
+            "user": user.model_dump(include=USER_RESPONSE_FIELDS),
             **tokens
         }
     
@@ -138,7 +151,7 @@ class AuthService:
                 "$set": {
                     "is_verified": True,
                     "email_verification_token": None,
-                    "updated_at": datetime.utcnow()
+                    "updated_at": CLOCK.now()
                 }
             }
         )
@@ -163,7 +176,7 @@ class AuthService:
                 "$set": {
                     "password_reset_token": reset_token,
                     "password_reset_expires": reset_expires,
-                    "updated_at": datetime.utcnow()
+                    "updated_at": CLOCK.now()
                 }
             }
         )
@@ -187,14 +200,15 @@ class AuthService:
             )
         
         # Update password
+        hashed_password = await get_password_hash_async(new_password)
         await self.users_collection.update_one(
             {"_id": user_doc["_id"]},
             {
                 "$set": {
-                    "hashed_password": get_password_hash(new_password),
+                    "hashed_password": hashed_password,
                     "password_reset_token": None,
                     "password_reset_expires": None,
-                    "updated_at": datetime.utcnow()
+                    "updated_at": CLOCK.now()
                 }
             }
         )
@@ -203,35 +217,43 @@ class AuthService:
     
     async def get_user_by_id(self, user_id: str) -> Optional[UserInDB]:
         """Get user by ID"""
-        user_doc = await self.users_collection.find_one({"_id": user_id})
+        user_doc = await self._get_user_fields(user_id)
         if user_doc:
             return UserInDB(**user_doc)
         return None
     
+    async def _get_user_fields(self, user_id: str, projection: Optional[dict] = None) -> Optional[dict]:
+        """Get the raw user document (optionally projected) without building a UserInDB"""
+        return await self.users_collection.find_one({"_id": user_id}, projection)
+    
     async def update_user_usage(self, user_id: str, usage_update: dict) -> bool:
         """Update user usage statistics"""
         result = await self.users_collection.update_one(
             {"_id": user_id},
             {
                 "$inc": usage_update,
-                "$set": {"updated_at": datetime.utcnow()}
+                "$set": {"updated_at": CLOCK.now()}
             }
         )
         return result.modified_count > 0
     
     async def check_user_limit(self, user_id: str, limit_type: str) -> bool:
         """Check if user has exceeded their tier limits"""
-        user = await self.get_user_by_id(user_id)
-        if not user:
+        user_doc = await self._get_user_fields(
+            user_id,
+            {"subscription.tier": 1, "usage.workflows_created": 1}
+        )
+        if not user_doc:
             return False
         
-        tier_limits = settings.tier_limits.get(user.subscription.tier, {})
+        tier = user_doc.get("subscription", {}).get("tier", UserTier.FREE)
+        tier_limits = settings.tier_limits.get(tier, {})
         
         if limit_type == "workflows":
             limit = tier_limits.get("workflows_per_month", 0)
             if limit == -1:  # Unlimited
                 return True
-            return user.usage.workflows_created < limit
+            return user_doc.get("usage", {}).get("workflows_created", 0) < limit
         
         # Add more limit checks as needed
         
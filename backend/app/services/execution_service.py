@@ -1,6 +1,11 @@
+import os
+import time
+import socket
 import asyncio
+import itertools
 import logging
-from typing import Optional, Dict, Any, List, Callable
+import orjson
+from typing import Optional, Dict, Any, List, Callable, Tuple, Iterator, Union
 from datetime import datetime, timedelta
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pymongo import ReturnDocument
@@ -9,14 +14,117 @@ from app.models.execution import (
     WorkflowExecution, ExecutionStep, TerminalOutput, Artifact,
     ExecutionStatus, StepStatus, TerminalOutputType, ExecutionCreate, ExecutionUpdate
 )
+from app.utils.clock import CLOCK
 
 logger = logging.getLogger(__name__)
 
+# Terminal outputs are buffered per execution and written with one insert_many (and sent as
+# one terminal_batch notification) per flush interval, or as soon as this many are waiting
+TERMINAL_FLUSH_INTERVAL_SECONDS = 0.05
+TERMINAL_FLUSH_MAX_OUTPUTS = 500
+
+# terminal_outputs is a time-series collection that expires documents after this long
+TERMINAL_OUTPUT_RETENTION_DAYS = 30
+
+# The latest known execution-level document (steps live in execution_steps) is kept in
+# memory briefly so reads don't go back to Mongo; every write here refreshes or evicts it.
+# Only finished executions are cached: anything else may be changing in another process's
+# worker. The short TTL bounds how long a delete or edit made by another process goes unseen.
+# Documents are only validated into WorkflowExecution when read.
+EXECUTION_CACHE_TTL_SECONDS = 5
+EXECUTION_CACHE_MAX_ENTRIES = 10_000
+CACHED_EXECUTION_STATUSES = frozenset({
+    ExecutionStatus.COMPLETED.value, ExecutionStatus.FAILED.value, ExecutionStatus.CANCELLED.value
+})
+
+# Each handler gets its own queue and delivery task so a slow one never holds up the rest;
+# when a queue is full the oldest message is dropped, and a handler that keeps falling
+# behind is unregistered
+HANDLER_QUEUE_SIZE = 256
+HANDLER_MAX_DROPPED_MESSAGES = 1024
+# Registrations beyond this many handlers for one execution are refused
+MAX_HANDLERS_PER_EXECUTION = 1024
+
+# Started executions wait in the execution_queue collection until a worker claims them.
+# A worker renews its claim (lease) while the workflow runs; a claim that hasn't been
+# renewed for EXECUTION_LEASE_SECONDS (e.g. the process died) can be taken over.
+EXECUTION_QUEUE_POLL_SECONDS = 1.0
+EXECUTION_LEASE_SECONDS = 60
+
+# A running workflow only writes status, progress and steps while its execution is in
+# one of these states, so a cancel from any process is never overwritten
+IN_FLIGHT_STATUSES = (ExecutionStatus.STARTING, ExecutionStatus.RUNNING, ExecutionStatus.PAUSED)
+
+# Workflow nodes whose upstream nodes have all completed run concurrently, at most this many at once
+MAX_PARALLEL_STEPS = 4
+
+# Progress-only step updates are merged per step and broadcast at most this often;
+# any other update to the step is sent straight away, carrying the merged progress
+STEP_PROGRESS_BROADCAST_INTERVAL_SECONDS = 0.1
+
+
+def _json_default(obj: Any) -> str:
+    """Fallback for values orjson cannot serialize natively (e.g. ObjectId)"""
+    return str(obj)
+
+
+def encode_update(message: Dict[str, Any]) -> str:
+    """
+    Wrap an execution update in the WebSocket envelope and encode it as JSON text.
+    Datetimes are left to orjson, which writes the naive UTC values as RFC 3339 with +00:00.
+    """
+    return orjson.dumps({
+        "type": message.get("type", "unknown"),
+        "data": message,
+        "timestamp": CLOCK.now()
+    }, default=_json_default, option=orjson.OPT_NAIVE_UTC).decode()
+
+
+class _ExecutionStopped(Exception):
+    """Raised inside a workflow once its execution is no longer in flight (e.g. cancelled elsewhere)"""
+
+
+def _count_reachable(ready: List[str], dependents: Dict[str, Dict[str, None]], waiting_on: Dict[str, int]) -> int:
+    """Count the nodes a topological walk from the ready nodes reaches (fewer than all means a cycle)"""
+    reached = 0
+    ready = list(ready)
+    while ready:
+        node_id = ready.pop()
+        reached += 1
+        for dependent in dependents[node_id]:
+            waiting_on[dependent] -= 1
+            if waiting_on[dependent] == 0:
+                ready.append(dependent)
+    return reached
+
+
+class _HandlerSubscription:
+    """A registered handler with its pending messages and the task delivering them"""
+    __slots__ = ("handler", "deliver", "queue", "task", "dropped")
+
+    def __init__(self, handler: Callable):
+        self.handler = handler
+        self.deliver = handler if asyncio.iscoroutinefunction(handler) else self._call_sync
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=HANDLER_QUEUE_SIZE)
+        self.task: Optional[asyncio.Task] = None
+        self.dropped = 0
+
+    async def _call_sync(self, message: str):
+        self.handler(message)
+
+
 class ExecutionService:
+    _execution_cache: Dict[str, Tuple[Dict[str, Any], float]] = {}  # execution_id -> (execution document, expires_at)
+    
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
-        self.active_executions: Dict[str, asyncio.Task] = {}
-        self.websocket_handlers: Dict[str, List[Callable]] = {}  # execution_id -> handlers
+        self.active_executions: Dict[str, asyncio.Task] = {}  # execution_id -> workflow task run by a worker here
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False  # Set while stop_workers shuts the workers and their workflows down
+        self.websocket_handlers: Dict[str, List[_HandlerSubscription]] = {}  # execution_id -> subscriptions
+        self._output_buffers: Dict[str, asyncio.Queue] = {}  # execution_id -> pending terminal outputs
+        self._output_flushers: Dict[str, asyncio.Task] = {}  # execution_id -> flusher draining the buffer
+        self._pending_step_updates: Dict[str, Dict[str, Dict[str, Any]]] = {}  # execution_id -> step_id -> merged update
         
     async def create_execution(self, user_id: str, execution_data: ExecutionCreate) -> WorkflowExecution:
         """Create a new workflow execution"""
@@ -28,7 +136,7 @@ class ExecutionService:
         )
         
         # Save to database
-        result = await self.db.executions.insert_one(execution.dict())
+        result = await self.db.executions.insert_one(execution.model_dump())
         execution.id = str(result.inserted_id)
         
         logger.info(f"Created execution {execution.id} for user {user_id}")
@@ -36,69 +144,85 @@ class ExecutionService:
     
     async def get_execution(self, execution_id: str, user_id: str) -> Optional[WorkflowExecution]:
         """Get execution by ID, ensuring user ownership"""
-        execution_doc = await self.db.executions.find_one({
-            "_id": execution_id,
-            "user_id": user_id
-        })
+        execution_doc = self._cached_execution_doc(execution_id)
+        if execution_doc is None:
+            execution_doc = await self.db.executions.find_one({
+                "_id": execution_id,
+                "user_id": user_id
+            })
+            if not execution_doc:
+                return None
+            self._cache_execution_doc(execution_id, execution_doc)
+        elif execution_doc.get("user_id") != user_id:
+            return None
+        
+        return await self._with_steps(execution_id, WorkflowExecution(**execution_doc))
+    
+    async def update_execution(
+        self,
+        execution_id: str,
+        update_data: ExecutionUpdate,
+        expected_status: Optional[ExecutionStatus] = None
+    ) -> Optional[WorkflowExecution]:
+        """
+        Update execution status and details, returning the updated execution (without steps).
+        With expected_status, the update only applies while the execution is in that state,
+        so a state check and its transition share one round-trip.
+        """
+        update_dict = update_data.model_dump(exclude_none=True)
         
+        execution_doc = await self._apply_execution_changes(execution_id, update_dict, expected_status)
         if execution_doc:
             return WorkflowExecution(**execution_doc)
         return None
     
-    async def update_execution(self, execution_id: str, update_data: ExecutionUpdate) -> Optional[WorkflowExecution]:
-        """Update execution status and details"""
-        update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
-        update_dict["updated_at"] = datetime.utcnow()
-        
-        result = await self.db.executions.find_one_and_update(
-            {"_id": execution_id},
-            {"$set": update_dict},
-            return_document=ReturnDocument.AFTER
-        )
-        
-        if result:
-            execution = WorkflowExecution(**result)
+    async def _apply_execution_changes(
+        self,
+        execution_id: str,
+        changes: Dict[str, Any],
+        expected_status: Optional[Union[ExecutionStatus, Tuple[ExecutionStatus, ...]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Write execution-level changes and broadcast just those changes; returns the updated document"""
+        execution_doc = await self._patch_execution(execution_id, changes, expected_status)
+        if execution_doc:
             # Notify WebSocket handlers
             await self.notify_websocket_handlers(execution_id, {
                 "type": "execution_updated",
-                "execution": execution.dict()
+                "execution_id": execution_id,
+                "changes": changes
             })
-            return execution
-        return None
+        return execution_doc
     
     async def start_execution(self, execution_id: str, workflow_data: Dict[str, Any]) -> bool:
         """Start workflow execution"""
-        execution = await self.get_execution_by_id(execution_id)
-        if not execution:
-            return False
-            
-        if execution.status != ExecutionStatus.PENDING:
-            logger.warning(f"Execution {execution_id} is not in pending state")
+        # Move to starting only if still pending
+        if not await self._apply_execution_changes(execution_id, {
+            "status": ExecutionStatus.STARTING.value
+        }, expected_status=ExecutionStatus.PENDING):
+            logger.warning(f"Execution {execution_id} was not found in pending state")
             return False
         
-        # Update execution status
-        await self.update_execution(execution_id, ExecutionUpdate(
-            status=ExecutionStatus.STARTING
-        ))
-        
-        # Start execution task
-        task = asyncio.create_task(
-            self._execute_workflow(execution_id, workflow_data)
-        )
-        self.active_executions[execution_id] = task
+        # Queue it for the next free worker (in this or any other process)
+        await self.db.execution_queue.insert_one({
+            "_id": execution_id,
+            "workflow_data": workflow_data,
+            "claimed_by": None,
+            "claimed_at": None,
+            "cancel_requested": False,
+            "enqueued_at": CLOCK.now()
+        })
         
-        logger.info(f"Started execution {execution_id}")
+        logger.info(f"Queued execution {execution_id}")
         return True
     
     async def pause_execution(self, execution_id: str) -> bool:
         """Pause workflow execution"""
-        if execution_id in self.active_executions:
-            # For now, we'll just update the status
-            # In a full implementation, we'd need to coordinate with the Claude Code bridge
-            await self.update_execution(execution_id, ExecutionUpdate(
-                status=ExecutionStatus.PAUSED
-            ))
-            
+        # For now, we'll just update the status; being a conditional write, it works from any
+        # process, not just the one running the workflow.
+        # In a full implementation, we'd need to coordinate with the Claude Code bridge
+        if await self._apply_execution_changes(execution_id, {
+            "status": ExecutionStatus.PAUSED.value
+        }, expected_status=ExecutionStatus.RUNNING):
             await self.notify_websocket_handlers(execution_id, {
                 "type": "execution_paused",
                 "execution_id": execution_id
@@ -108,12 +232,9 @@ class ExecutionService:
     
     async def resume_execution(self, execution_id: str) -> bool:
         """Resume paused workflow execution"""
-        execution = await self.get_execution_by_id(execution_id)
-        if execution and execution.status == ExecutionStatus.PAUSED:
-            await self.update_execution(execution_id, ExecutionUpdate(
-                status=ExecutionStatus.RUNNING
-            ))
-            
+        if await self._apply_execution_changes(execution_id, {
+            "status": ExecutionStatus.RUNNING.value
+        }, expected_status=ExecutionStatus.PAUSED):
             await self.notify_websocket_handlers(execution_id, {
                 "type": "execution_resumed",
                 "execution_id": execution_id
@@ -123,74 +244,265 @@ class ExecutionService:
     
     async def cancel_execution(self, execution_id: str) -> bool:
         """Cancel workflow execution"""
-        if execution_id in self.active_executions:
-            task = self.active_executions[execution_id]
+        task = self.active_executions.pop(execution_id, None)
+        if task is not None:
             task.cancel()
-            del self.active_executions[execution_id]
-            
-            await self.update_execution(execution_id, ExecutionUpdate(
-                status=ExecutionStatus.CANCELLED,
-                end_time=datetime.utcnow()
-            ))
-            
-            await self.notify_websocket_handlers(execution_id, {
-                "type": "execution_cancelled",
-                "execution_id": execution_id
-            })
-            return True
-        return False
+        else:
+            # Still queued: drop the job. Running in another process: flag it, and the
+            # worker running it cancels the workflow when it next renews its lease.
+            result = await self.db.execution_queue.delete_one({"_id": execution_id, "claimed_by": None})
+            if not result.deleted_count:
+                result = await self.db.execution_queue.update_one(
+                    {"_id": execution_id},
+                    {"$set": {"cancel_requested": True}}
+                )
+                if not result.matched_count:
+                    return False
+        
+        self._execution_cache.pop(execution_id, None)
+        await self._apply_execution_changes(execution_id, {
+            "status": ExecutionStatus.CANCELLED.value,
+            "end_time": CLOCK.now()
+        })
+        
+        await self.notify_websocket_handlers(execution_id, {
+            "type": "execution_cancelled",
+            "execution_id": execution_id
+        })
+        return True
     
-    async def add_execution_step(self, execution_id: str, step: ExecutionStep) -> bool:
-        """Add a step to the execution"""
-        result = await self.db.executions.update_one(
-            {"_id": execution_id},
-            {
-                "$push": {"steps": step.dict()},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
+    async def delete_execution(self, execution_id: str) -> bool:
+        """Delete an execution with its steps and terminal outputs; returns False if it didn't exist"""
+        self._execution_cache.pop(execution_id, None)
+        await asyncio.gather(
+            self.db.execution_steps.delete_many({"execution_id": execution_id}),
+            self.db.terminal_outputs.delete_many({"execution_id": execution_id})
         )
+        result = await self.db.executions.delete_one({"_id": execution_id})
+        return result.deleted_count > 0
+    
+    def start_workers(self, count: int):
+        """Start workers that claim and run queued executions"""
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for number in range(count):
+            self._workers.append(asyncio.create_task(self._run_worker(f"{prefix}:{number}")))
+        logger.info(f"Started {count} execution workers")
+    
+    async def stop_workers(self):
+        """
+        Stop the workers and the workflows they were running, so nothing writes after shutdown.
+        Those executions keep their status and are taken over once their lease lapses.
+        """
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
         
-        if result.modified_count > 0:
-            await self.notify_websocket_handlers(execution_id, {
-                "type": "step_added",
-                "step": step.dict()
-            })
-            return True
-        return False
+        workflows = list(self.active_executions.values())
+        for workflow in workflows:
+            workflow.cancel()
+        await asyncio.gather(*workflows, return_exceptions=True)
+    
+    async def _run_worker(self, worker_id: str):
+        while True:
+            try:
+                job = await self._claim_job(worker_id)
+                if job is None:
+                    await asyncio.sleep(EXECUTION_QUEUE_POLL_SECONDS)
+                elif job.get("cancel_requested"):
+                    # Cancelled while its previous worker was gone
+                    await self.db.execution_queue.delete_one({"_id": job["_id"], "claimed_by": worker_id})
+                else:
+                    await self._run_job(worker_id, job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Execution worker {worker_id} failed: {e}")
+                await asyncio.sleep(EXECUTION_QUEUE_POLL_SECONDS)
+    
+    async def _claim_job(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """Claim the oldest job that is unclaimed or whose lease has lapsed"""
+        now = CLOCK.now()
+        return await self.db.execution_queue.find_one_and_update(
+            {"$or": [
+                {"claimed_at": None},
+                {"claimed_at": {"$lt": now - timedelta(seconds=EXECUTION_LEASE_SECONDS)}}
+            ]},
+            {"$set": {"claimed_by": worker_id, "claimed_at": now}},
+            sort=[("enqueued_at", 1)],
+            return_document=ReturnDocument.AFTER
+        )
+    
+    async def _run_job(self, worker_id: str, job: Dict[str, Any]):
+        """Run a claimed execution, renewing the lease until it finishes"""
+        execution_id = job["_id"]
+        task = asyncio.create_task(self._execute_workflow(execution_id, job["workflow_data"]))
+        self.active_executions[execution_id] = task
+        logger.info(f"Worker {worker_id} started execution {execution_id}")
+        
+        while not task.done():
+            done, _ = await asyncio.wait({task}, timeout=EXECUTION_LEASE_SECONDS / 3)
+            if done:
+                break
+            lease = await self.db.execution_queue.find_one_and_update(
+                {"_id": execution_id, "claimed_by": worker_id},
+                {"$set": {"claimed_at": CLOCK.now()}},
+                projection={"cancel_requested": 1}
+            )
+            if lease is None or lease.get("cancel_requested"):
+                # Cancelled elsewhere, or another worker took the job over
+                task.cancel()
+        
+        await self.db.execution_queue.delete_one({"_id": execution_id, "claimed_by": worker_id})
+    
+    async def add_execution_step(self, execution_id: str, step: ExecutionStep, order: int = 0) -> bool:
+        """
+        Add a step to the execution (steps are listed by order).
+        Writing a step id again replaces that step, so a re-run execution doesn't duplicate steps.
+        """
+        step_doc = step.model_dump()
+        await self.db.execution_steps.replace_one({"_id": step.id}, {
+            **step_doc,
+            "_id": step.id,
+            "execution_id": execution_id,
+            "order": order
+        }, upsert=True)
+        
+        await self.notify_websocket_handlers(execution_id, {
+            "type": "step_added",
+            "step": step_doc
+        })
+        return True
     
     async def update_execution_step(self, execution_id: str, step_id: str, step_update: Dict[str, Any]) -> bool:
         """Update a specific step in the execution"""
-        step_update["updated_at"] = datetime.utcnow()
+        if await self._patch_step(execution_id, step_id, step_update):
+            progress_only = step_update.keys() <= {"progress"}
+            self._notify_step_updated(execution_id, step_id, step_update, coalesce=progress_only)
+            return True
+        return False
+    
+    def _notify_step_updated(self, execution_id: str, step_id: str, update: Dict[str, Any], coalesce: bool = False):
+        """Broadcast a step_updated, or hold it for the next progress flush when coalescing"""
+        if not self._has_subscribers(execution_id):
+            return
         
-        result = await self.db.executions.update_one(
-            {"_id": execution_id, "steps.id": step_id},
-            {
-                "$set": {f"steps.$.{k}": v for k, v in step_update.items()},
-                "$set": {"updated_at": datetime.utcnow()}
-            }
+        pending = self._pending_step_updates.get(execution_id)
+        if coalesce:
+            if pending is None:
+                pending = self._pending_step_updates[execution_id] = {}
+                asyncio.get_running_loop().call_later(
+                    STEP_PROGRESS_BROADCAST_INTERVAL_SECONDS, self._flush_step_updates, execution_id
+                )
+            pending[step_id] = {**pending.get(step_id, {}), **update}
+            return
+        
+        earlier = pending.pop(step_id, None) if pending else None
+        if earlier:
+            update = {**earlier, **update}
+        self._broadcast(execution_id, {"type": "step_updated", "step_id": step_id, "update": update})
+    
+    def _flush_step_updates(self, execution_id: str):
+        for step_id, update in self._pending_step_updates.pop(execution_id, {}).items():
+            self._broadcast(execution_id, {"type": "step_updated", "step_id": step_id, "update": update})
+    
+    async def _patch_step(self, execution_id: str, step_id: str, step_patch: Dict[str, Any]) -> bool:
+        """Set fields on one step document (updated_at is stamped by the server); returns False if the step was not found"""
+        result = await self.db.execution_steps.update_one(
+            {"_id": step_id, "execution_id": execution_id},
+            {"$set": step_patch, "$currentDate": {"updated_at": True}}
         )
+        return result.matched_count > 0
+    
+    async def _patch_execution(
+        self,
+        execution_id: str,
+        execution_patch: Dict[str, Any],
+        expected_status: Optional[Union[ExecutionStatus, Tuple[ExecutionStatus, ...]]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Set execution-level fields and return the updated execution document (without steps).
+        With expected_status (one status or a tuple of them) nothing is written, and None is
+        returned, unless the execution is in that state. updated_at is stamped by the server.
+        """
+        query = {"_id": execution_id}
+        if isinstance(expected_status, tuple):
+            query["status"] = {"$in": [status.value for status in expected_status]}
+        elif expected_status is not None:
+            query["status"] = expected_status.value
         
-        if result.modified_count > 0:
-            await self.notify_websocket_handlers(execution_id, {
-                "type": "step_updated",
-                "step_id": step_id,
-                "update": step_update
-            })
-            return True
-        return False
+        result = await self.db.executions.find_one_and_update(
+            query,
+            {"$set": execution_patch, "$currentDate": {"updated_at": True}},
+            return_document=ReturnDocument.AFTER
+        )
+        if result:
+            return self._cache_execution_doc(execution_id, result)
+        self._execution_cache.pop(execution_id, None)
+        return None
     
     async def add_terminal_output(self, execution_id: str, output: TerminalOutput) -> bool:
-        """Add terminal output to the execution"""
-        result = await self.db.terminal_outputs.insert_one(output.dict())
+        """Queue terminal output for the execution; it is persisted and broadcast in batches"""
+        buffer = self._output_buffers.get(execution_id)
+        if buffer is None:
+            buffer = asyncio.Queue()
+            self._output_buffers[execution_id] = buffer
+            self._output_flushers[execution_id] = asyncio.create_task(
+                self._flush_terminal_outputs(execution_id, buffer)
+            )
         
-        if result.inserted_id:
-            # Notify WebSocket handlers
-            await self.notify_websocket_handlers(execution_id, {
-                "type": "terminal_output",
-                "output": output.dict()
-            })
-            return True
-        return False
+        buffer.put_nowait(output.model_dump())
+        return True
+    
+    async def close_terminal_output_buffer(self, execution_id: str):
+        """Flush any buffered terminal output for the execution and stop its flusher"""
+        buffer = self._output_buffers.pop(execution_id, None)
+        flusher = self._output_flushers.pop(execution_id, None)
+        if buffer is None or flusher is None:
+            return
+        
+        # None tells the flusher to write what it has and exit
+        buffer.put_nowait(None)
+        await flusher
+    
+    async def _flush_terminal_outputs(self, execution_id: str, buffer: asyncio.Queue):
+        """Drain the buffer into insert_many + terminal_batch notifications until closed"""
+        closed = False
+        while not closed:
+            first = await buffer.get()
+            batch = [] if first is None else [first]
+            closed = first is None
+            
+            if not closed and buffer.qsize() < TERMINAL_FLUSH_MAX_OUTPUTS - 1:
+                # Let a burst of output accumulate so it shares one write
+                await asyncio.sleep(TERMINAL_FLUSH_INTERVAL_SECONDS)
+            while not closed and len(batch) < TERMINAL_FLUSH_MAX_OUTPUTS and not buffer.empty():
+                output = buffer.get_nowait()
+                if output is None:
+                    closed = True
+                else:
+                    batch.append(output)
+            
+            if not batch:
+                continue
+            
+            # insert_many adds _id to the documents it is given, so insert copies when the
+            # batch is also going out to subscribers
+            listening = self._has_subscribers(execution_id)
+            try:
+                await self.db.terminal_outputs.insert_many(
+                    [dict(output) for output in batch] if listening else batch,
+                    ordered=False
+                )
+            except Exception as e:
+                logger.error(f"Failed to persist {len(batch)} terminal outputs for execution {execution_id}: {e}")
+            
+            if listening:
+                await self.notify_websocket_handlers(execution_id, {
+                    "type": "terminal_batch",
+                    "outputs": batch
+                })
     
     async def get_terminal_outputs(
         self, 
@@ -203,62 +515,148 @@ class ExecutionService:
         if step_id:
             query["step_id"] = step_id
             
-        cursor = self.db.terminal_outputs.find(query).sort("timestamp", 1).limit(limit)
+        # Fetch the whole page in one round-trip via the (execution_id, timestamp) index
+        cursor = (
+            self.db.terminal_outputs.find(query)
+            .sort("timestamp", 1)
+            .hint([("execution_id", 1), ("timestamp", 1)])
+            .limit(limit)
+            .batch_size(limit)
+        )
         outputs = await cursor.to_list(length=limit)
         
         return [TerminalOutput(**output) for output in outputs]
     
-    async def register_websocket_handler(self, execution_id: str, handler: Callable):
-        """Register a WebSocket handler for execution updates"""
-        if execution_id not in self.websocket_handlers:
-            self.websocket_handlers[execution_id] = []
-        self.websocket_handlers[execution_id].append(handler)
+    async def register_websocket_handler(self, execution_id: str, handler: Callable) -> bool:
+        """
+        Register a WebSocket handler for execution updates (called with encoded JSON text).
+        Returns False if the execution already has MAX_HANDLERS_PER_EXECUTION handlers.
+        """
+        if len(self.websocket_handlers.get(execution_id, ())) >= MAX_HANDLERS_PER_EXECUTION:
+            logger.warning(f"Refusing WebSocket handler for execution {execution_id}: too many handlers")
+            return False
+        
+        subscription = _HandlerSubscription(handler)
+        subscription.task = asyncio.create_task(self._deliver_to_handler(execution_id, subscription))
+        self.websocket_handlers.setdefault(execution_id, []).append(subscription)
         logger.info(f"Registered WebSocket handler for execution {execution_id}")
+        return True
     
     async def unregister_websocket_handler(self, execution_id: str, handler: Callable):
         """Unregister a WebSocket handler"""
-        if execution_id in self.websocket_handlers:
-            try:
-                self.websocket_handlers[execution_id].remove(handler)
-                if not self.websocket_handlers[execution_id]:
-                    del self.websocket_handlers[execution_id]
+        for subscription in self.websocket_handlers.get(execution_id, []):
+            if subscription.handler == handler:
+                self._remove_subscription(execution_id, subscription)
                 logger.info(f"Unregistered WebSocket handler for execution {execution_id}")
-            except ValueError:
-                pass
+                return
+    
+    def _remove_subscription(self, execution_id: str, subscription: _HandlerSubscription):
+        subscriptions = self.websocket_handlers.get(execution_id)
+        if subscriptions and subscription in subscriptions:
+            subscriptions.remove(subscription)
+            if not subscriptions:
+                del self.websocket_handlers[execution_id]
+        if subscription.task is not asyncio.current_task():
+            subscription.task.cancel()
+    
+    async def _deliver_to_handler(self, execution_id: str, subscription: _HandlerSubscription):
+        """Feed one handler its queued messages in order; a handler that raises is dropped"""
+        deliver = subscription.deliver
+        while True:
+            message = await subscription.queue.get()
+            try:
+                await deliver(message)
+            except Exception as e:
+                logger.error(f"Error notifying WebSocket handler, unregistering it: {e}")
+                self._remove_subscription(execution_id, subscription)
+                return
     
     async def notify_websocket_handlers(self, execution_id: str, message: Dict[str, Any]):
-        """Notify all WebSocket handlers for an execution"""
-        if execution_id in self.websocket_handlers:
-            handlers = self.websocket_handlers[execution_id].copy()  # Avoid modification during iteration
-            for handler in handlers:
-                try:
-                    if asyncio.iscoroutinefunction(handler):
-                        await handler(message)
-                    else:
-                        handler(message)
-                except Exception as e:
-                    logger.error(f"Error notifying WebSocket handler: {e}")
+        """
+        Queue a message for every handler of an execution; never waits on the handlers.
+        Handlers receive the update already encoded by encode_update, shared by all of them.
+        """
+        self._broadcast(execution_id, message)
+    
+    def _has_subscribers(self, execution_id: str) -> bool:
+        """Whether anyone is listening; lets callers skip building messages for headless runs"""
+        return execution_id in self.websocket_handlers
+    
+    def _broadcast(self, execution_id: str, message: Dict[str, Any]):
+        subscriptions = self.websocket_handlers.get(execution_id)
+        if not subscriptions:
+            return
+        
+        frame = encode_update(message)
+        for subscription in list(subscriptions):  # Slow handlers may be removed below
+            queue = subscription.queue
+            if queue.full():
+                queue.get_nowait()
+                subscription.dropped += 1
+                if subscription.dropped >= HANDLER_MAX_DROPPED_MESSAGES:
+                    logger.warning(f"Unregistering WebSocket handler for execution {execution_id}: too far behind")
+                    self._remove_subscription(execution_id, subscription)
+                    continue
+            queue.put_nowait(frame)
     
     async def get_execution_by_id(self, execution_id: str) -> Optional[WorkflowExecution]:
         """Get execution by ID without user restriction (internal use)"""
-        execution_doc = await self.db.executions.find_one({"_id": execution_id})
-        if execution_doc:
-            return WorkflowExecution(**execution_doc)
+        execution_doc = self._cached_execution_doc(execution_id)
+        if execution_doc is None:
+            execution_doc = await self.db.executions.find_one({"_id": execution_id})
+            if not execution_doc:
+                return None
+            self._cache_execution_doc(execution_id, execution_doc)
+        
+        return await self._with_steps(execution_id, WorkflowExecution(**execution_doc))
+    
+    async def _with_steps(self, execution_id: str, execution: WorkflowExecution) -> WorkflowExecution:
+        """Attach the execution's steps, loaded from execution_steps"""
+        step_docs = await self.db.execution_steps.find(
+            {"execution_id": execution_id}
+        ).sort("order", 1).to_list(length=None)
+        if not step_docs:
+            # Nothing split out yet (or an older execution with embedded steps)
+            return execution
+        
+        execution.steps = [ExecutionStep(**doc) for doc in step_docs]
+        return execution
+    
+    def _cached_execution_doc(self, execution_id: str) -> Optional[Dict[str, Any]]:
+        cached = self._execution_cache.get(execution_id)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
         return None
     
+    def _cache_execution_doc(self, execution_id: str, execution_doc: Dict[str, Any]) -> Dict[str, Any]:
+        if execution_doc.get("status") not in CACHED_EXECUTION_STATUSES:
+            self._execution_cache.pop(execution_id, None)
+            return execution_doc
+        if len(self._execution_cache) >= EXECUTION_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for key in [k for k, (_, expires_at) in self._execution_cache.items() if expires_at <= now]:
+                del self._execution_cache[key]
+            if len(self._execution_cache) >= EXECUTION_CACHE_MAX_ENTRIES:
+                self._execution_cache.clear()
+        self._execution_cache[execution_id] = (execution_doc, time.monotonic() + EXECUTION_CACHE_TTL_SECONDS)
+        return execution_doc
+    
     async def _execute_workflow(self, execution_id: str, workflow_data: Dict[str, Any]):
         """Internal method to execute workflow (placeholder for Claude Code integration)"""
         try:
-            # Update status to running
-            await self.update_execution(execution_id, ExecutionUpdate(
-                status=ExecutionStatus.RUNNING,
-                start_time=datetime.utcnow()
-            ))
+            # Update status to running, unless it was cancelled while queued
+            started_at = CLOCK.now()
+            if not await self._apply_execution_changes(execution_id, {
+                "status": ExecutionStatus.RUNNING.value,
+                "start_time": started_at
+            }, expected_status=IN_FLIGHT_STATUSES):
+                logger.info(f"Execution {execution_id} is no longer in flight, not running it")
+                return
             
             await self.notify_websocket_handlers(execution_id, {
                 "type": "execution_started",
                 "execution_id": execution_id,
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": started_at
             })
             
             # Simulate workflow execution with mock steps
@@ -266,138 +664,226 @@ class ExecutionService:
             await self._simulate_workflow_execution(execution_id, workflow_data)
             
         except asyncio.CancelledError:
+            if self._stopping:
+                # Shutting down, not cancelled: leave it in flight for another worker to take over
+                logger.info(f"Execution {execution_id} interrupted by shutdown")
+                return
             logger.info(f"Execution {execution_id} was cancelled")
-            await self.update_execution(execution_id, ExecutionUpdate(
-                status=ExecutionStatus.CANCELLED,
-                end_time=datetime.utcnow()
-            ))
+            await self._apply_execution_changes(execution_id, {
+                "status": ExecutionStatus.CANCELLED.value,
+                "end_time": CLOCK.now()
+            }, expected_status=IN_FLIGHT_STATUSES)
+        except _ExecutionStopped:
+            logger.info(f"Execution {execution_id} stopped: no longer in flight")
         except Exception as e:
             logger.error(f"Execution {execution_id} failed: {e}")
-            await self.update_execution(execution_id, ExecutionUpdate(
-                status=ExecutionStatus.FAILED,
-                error_message=str(e),
-                end_time=datetime.utcnow()
-            ))
-            
-            await self.notify_websocket_handlers(execution_id, {
-                "type": "execution_failed",
-                "execution_id": execution_id,
-                "error": str(e),
-                "timestamp": datetime.utcnow().isoformat()
-            })
+            failed_at = CLOCK.now()
+            if await self._apply_execution_changes(execution_id, {
+                "status": ExecutionStatus.FAILED.value,
+                "error_message": str(e),
+                "end_time": failed_at
+            }, expected_status=IN_FLIGHT_STATUSES):
+                await self.notify_websocket_handlers(execution_id, {
+                    "type": "execution_failed",
+                    "execution_id": execution_id,
+                    "error": str(e),
+                    "timestamp": failed_at
+                })
         finally:
             # Clean up
+            await self.close_terminal_output_buffer(execution_id)
             if execution_id in self.active_executions:
                 del self.active_executions[execution_id]
     
     async def _simulate_workflow_execution(self, execution_id: str, workflow_data: Dict[str, Any]):
-        """Simulate workflow execution for testing (replace with real Claude Code integration)"""
+        """
+        Simulate workflow execution for testing (replace with real Claude Code integration).
+        A node runs once every node with an edge into it has completed, so independent
+        branches overlap; at most MAX_PARALLEL_STEPS run at a time.
+        """
         nodes = workflow_data.get("nodes", [])
+        node_ids = [str(node.get("id", index)) for index, node in enumerate(nodes)]
+        order_of = {node_id: index for index, node_id in enumerate(node_ids)}
+        if len(order_of) < len(node_ids):
+            # Edges and step ids refer to nodes by id, so a shared id can't be scheduled
+            raise ValueError("Workflow has duplicate node ids")
         
-        for i, node in enumerate(nodes):
-            step = ExecutionStep(
-                name=f"Execute {node.get('data', {}).get('name', 'Agent')}",
-                agent_type=node.get('data', {}).get('type', 'unknown'),
-                status=StepStatus.RUNNING,
-                start_time=datetime.utcnow()
-            )
-            
-            # Add step to execution
-            await self.add_execution_step(execution_id, step)
-            
-            # Notify step started
-            await self.notify_websocket_handlers(execution_id, {
-                "type": "step_started",
-                "step": step.dict(),
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            
-            # Simulate terminal output
-            await self.add_terminal_output(execution_id, TerminalOutput(
+        # Dicts double as ordered sets so duplicate edges count once
+        dependents: Dict[str, Dict[str, None]] = {node_id: {} for node_id in node_ids}
+        for edge in workflow_data.get("edges", []):
+            source, target = str(edge.get("source")), str(edge.get("target"))
+            if source in dependents and target in dependents and source != target:
+                dependents[source][target] = None
+        waiting_on = {node_id: 0 for node_id in node_ids}
+        for targets in dependents.values():
+            for target in targets:
+                waiting_on[target] += 1
+        
+        ready = [node_id for node_id in node_ids if waiting_on[node_id] == 0]
+        if _count_reachable(ready, dependents, dict(waiting_on)) < len(node_ids):
+            raise ValueError("Workflow has a dependency cycle")
+        
+        semaphore = asyncio.Semaphore(MAX_PARALLEL_STEPS)
+        completion_counter = itertools.count(1)
+        
+        async def run_node(node_id: str) -> str:
+            async with semaphore:
+                order = order_of[node_id]
+                await self._simulate_step(execution_id, nodes[order], order, len(nodes), completion_counter)
+            return node_id
+        
+        pending = {asyncio.create_task(run_node(node_id)) for node_id in ready}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    for dependent in dependents[task.result()]:
+                        waiting_on[dependent] -= 1
+                        if waiting_on[dependent] == 0:
+                            pending.add(asyncio.create_task(run_node(dependent)))
+        finally:
+            # A failed or cancelled run stops the branches still in flight
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        # Complete execution
+        completed_at = CLOCK.now()
+        if not await self._apply_execution_changes(execution_id, {
+            "status": ExecutionStatus.COMPLETED.value,
+            "end_time": completed_at,
+            "progress": 100.0
+        }, expected_status=IN_FLIGHT_STATUSES):
+            raise _ExecutionStopped(execution_id)
+        
+        await self.notify_websocket_handlers(execution_id, {
+            "type": "execution_completed",
+            "execution_id": execution_id,
+            "timestamp": completed_at
+        })
+        
+        logger.info(f"Execution {execution_id} completed successfully")
+    
+    async def _simulate_step(
+        self,
+        execution_id: str,
+        node: Dict[str, Any],
+        order: int,
+        total_steps: int,
+        completion_counter: Iterator[int]
+    ):
+        """Simulate one workflow node as an execution step"""
+        # Timestamps come from the shared millisecond clock, read once per event and
+        # reused for the writes, terminal output and notification that describe it
+        started_at = CLOCK.now()
+        step = ExecutionStep(
+            # Stable per node, so a run taken over by another worker rewrites the same steps
+            id=f"{execution_id}:{node.get('id', order)}",
+            name=f"Execute {node.get('data', {}).get('name', 'Agent')}",
+            agent_type=node.get('data', {}).get('type', 'unknown'),
+            status=StepStatus.RUNNING,
+            start_time=started_at
+        )
+        
+        # Add step to execution alongside its first terminal output
+        await asyncio.gather(
+            self.add_execution_step(execution_id, step, order=order),
+            self.add_terminal_output(execution_id, TerminalOutput(
                 execution_id=execution_id,
                 step_id=step.id,
                 type=TerminalOutputType.SYSTEM,
                 content=f"Starting {step.name}...",
-                agent=step.agent_type
+                agent=step.agent_type,
+                timestamp=started_at
             ))
-            
-            # Simulate work
-            for progress in [25, 50, 75]:
-                await asyncio.sleep(1)  # Simulate work
-                await self.update_execution_step(execution_id, step.id, {
+        )
+        
+        # Notify step started
+        if self._has_subscribers(execution_id):
+            await self.notify_websocket_handlers(execution_id, {
+                "type": "step_started",
+                "step": step.model_dump(),
+                "timestamp": started_at
+            })
+        
+        # Simulate work; each progress write overlaps the next stretch of work
+        # (the step insert above has finished, so the writes always find the step)
+        await asyncio.sleep(1)
+        for progress in [25, 50, 75]:
+            await self._ensure_in_flight(execution_id)
+            await asyncio.gather(
+                self.update_execution_step(execution_id, step.id, {
                     "progress": progress
-                })
-                
-                await self.add_terminal_output(execution_id, TerminalOutput(
+                }),
+                self.add_terminal_output(execution_id, TerminalOutput(
                     execution_id=execution_id,
                     step_id=step.id,
                     type=TerminalOutputType.STDOUT,
                     content=f"Progress: {progress}%",
-                    agent=step.agent_type
-                ))
-            
-            # Complete step
-            await asyncio.sleep(1)
-            end_time = datetime.utcnow()
-            duration = str(end_time - step.start_time)
-            
-            await self.update_execution_step(execution_id, step.id, {
-                "status": StepStatus.COMPLETED.value,
-                "end_time": end_time,
-                "duration": duration,
-                "progress": 100
-            })
-            
-            await self.add_terminal_output(execution_id, TerminalOutput(
-                execution_id=execution_id,
-                step_id=step.id,
-                type=TerminalOutputType.SYSTEM,
-                content=f"✅ Completed {step.name}",
-                agent=step.agent_type
-            ))
-            
-            # Notify step completed
-            await self.notify_websocket_handlers(execution_id, {
-                "type": "step_completed",
-                "step_id": step.id,
-                "duration": duration,
-                "timestamp": datetime.utcnow().isoformat()
-            })
-            
-            # Update overall progress
-            completed_steps = i + 1
-            progress = (completed_steps / len(nodes)) * 100
-            await self.update_execution(execution_id, ExecutionUpdate(
-                progress=progress,
-                completed_steps=completed_steps,
-                current_step_id=step.id if i < len(nodes) - 1 else None
-            ))
+                    agent=step.agent_type,
+                    timestamp=CLOCK.now()
+                )),
+                asyncio.sleep(1)  # Simulate work
+            )
         
-        # Complete execution
-        await self.update_execution(execution_id, ExecutionUpdate(
-            status=ExecutionStatus.COMPLETED,
-            end_time=datetime.utcnow(),
-            progress=100.0
+        # Complete step and update overall progress concurrently
+        end_time = CLOCK.now()
+        duration = str(end_time - step.start_time)
+        completed_steps = next(completion_counter)
+        
+        step_update = {
+            "status": StepStatus.COMPLETED.value,
+            "end_time": end_time,
+            "duration": duration,
+            "progress": 100
+        }
+        execution_changes = {
+            "progress": (completed_steps / total_steps) * 100,
+            "completed_steps": completed_steps,
+            "current_step_id": step.id if completed_steps < total_steps else None
+        }
+        # The execution write goes first: it is what confirms the run wasn't cancelled meanwhile
+        if not await self._patch_execution(execution_id, execution_changes, expected_status=IN_FLIGHT_STATUSES):
+            raise _ExecutionStopped(execution_id)
+        if await self._patch_step(execution_id, step.id, step_update):
+            self._notify_step_updated(execution_id, step.id, step_update)
+        
+        await self.add_terminal_output(execution_id, TerminalOutput(
+            execution_id=execution_id,
+            step_id=step.id,
+            type=TerminalOutputType.SYSTEM,
+            content=f"✅ Completed {step.name}",
+            agent=step.agent_type,
+            timestamp=end_time
         ))
         
+        # Notify step completed
         await self.notify_websocket_handlers(execution_id, {
-            "type": "execution_completed",
-            "execution_id": execution_id,
-            "timestamp": datetime.utcnow().isoformat()
+            "type": "step_completed",
+            "step_id": step.id,
+            "duration": duration,
+            "timestamp": end_time
         })
         
-        logger.info(f"Execution {execution_id} completed successfully")
+        await self.notify_websocket_handlers(execution_id, {
+            "type": "execution_updated",
+            "execution_id": execution_id,
+            "changes": execution_changes
+        })
+    
+    async def _ensure_in_flight(self, execution_id: str):
+        """Stop the workflow if its execution was cancelled or finished, possibly by another process"""
+        if not await self.db.executions.find_one(
+            {"_id": execution_id, "status": {"$in": [status.value for status in IN_FLIGHT_STATUSES]}},
+            {"_id": 1}
+        ):
+            raise _ExecutionStopped(execution_id)
     
     async def cleanup_old_executions(self, days: int = 30):
-        """Clean up old executions and terminal outputs"""
+        """Archive old executions (terminal outputs expire on their own)"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         
-        # Delete old terminal outputs
-        result = await self.db.terminal_outputs.delete_many({
-            "timestamp": {"$lt": cutoff_date}
-        })
-        logger.info(f"Cleaned up {result.deleted_count} old terminal outputs")
-        
         # Mark old executions as archived or delete them
         result = await self.db.executions.update_many(
             {
@@ -406,4 +892,5 @@ class ExecutionService:
             },
             {"$set": {"archived": True}}
         )
+        self._execution_cache.clear()
         logger.info(f"Archived {result.modified_count} old executions")
\ No newline at end of file
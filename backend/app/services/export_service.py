@@ -1,10 +1,14 @@
 import json
 import yaml
-from typing import Dict, Any
+import orjson
+from typing import Dict, Any, AsyncIterator
 from datetime import datetime
 
 from app.models.project import Project, ProjectExport, ExportFormat
 
+# Characters of export content encoded per streamed chunk
+EXPORT_STREAM_CHUNK_CHARS = 64 * 1024
+
 
 class ExportService:
     """Service for exporting projects in various formats"""
@@ -23,6 +27,22 @@ class ExportService:
         else:
             raise ValueError(f"Unsupported export format: {options.format}")
     
+    async def export_project_stream(self, project: Project, options: ProjectExport) -> AsyncIterator[bytes]:
+        """Export project as a chunked JSON body; export errors are raised before streaming starts"""
+        export_data = await self.export_project(project, options)
+        return self._stream_export(export_data)
+    
+    async def _stream_export(self, export_data: Dict[str, Any]) -> AsyncIterator[bytes]:
+        """Encode an export as JSON, emitting the (potentially large) content string in slices"""
+        content = export_data["content"]
+        head = {key: value for key, value in export_data.items() if key != "content"}
+        
+        # Everything but content, then an open "content" string continued slice by slice
+        yield orjson.dumps(head)[:-1] + b',"content":"'
+        for start in range(0, len(content), EXPORT_STREAM_CHUNK_CHARS):
+            yield orjson.dumps(content[start:start + EXPORT_STREAM_CHUNK_CHARS])[1:-1]
+        yield b'"}'
+    
     def _export_as_json(self, project: Project, options: ProjectExport) -> Dict[str, Any]:
         """Export project as JSON"""
         export_data = {
@@ -1,17 +1,72 @@
+import os
 import httpx
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import orjson
+import time
+from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime, timedelta
 import asyncio
 
 logger = logging.getLogger(__name__)
 
+# GET responses kept for conditional requests; a 304 revalidation costs no body and,
+# for most endpoints, none of the caller's rate limit. The cache is bounded by the total
+# size of the bodies it holds, larger bodies are not cached at all, and entries expire
+# so a token that is no longer used doesn't pin its responses in memory
+ETAG_CACHE_MAX_BYTES = 16 * 1024 * 1024
+ETAG_CACHE_MAX_BODY_BYTES = 256 * 1024
+ETAG_CACHE_TTL_SECONDS = 600
+
+# Root files that identify tooling, by lowercased name -> (analysis field, value)
+ROOT_FILE_MARKERS = {
+    "package.json": ("package_managers", "npm"),
+    "requirements.txt": ("package_managers", "pip"),
+    "cargo.toml": ("package_managers", "cargo"),
+    "go.mod": ("package_managers", "go"),
+    "dockerfile": ("build_tools", "docker"),
+    "docker-compose.yml": ("build_tools", "docker"),
+    "readme.md": ("has_docs", True),
+    "readme.rst": ("has_docs", True)
+}
+SOURCE_EXTENSIONS = {
+    ".js": "javascript",
+    ".jsx": "javascript",
+    ".ts": "javascript",
+    ".tsx": "javascript",
+    ".py": "python",
+    ".go": "go",
+    ".rs": "rust"
+}
+
+# package.json dependencies that identify the framework, most specific first
+PACKAGE_FRAMEWORKS = (
+    ("next", "nextjs"),
+    ("@angular/core", "angular"),
+    ("vue", "vue"),
+    ("svelte", "svelte"),
+    ("react", "react"),
+    ("express", "express")
+)
+PACKAGE_TEST_FRAMEWORKS = ("jest", "vitest", "mocha", "cypress", "@playwright/test")
+
 class GitHubService:
     """GitHub API service that works with Clerk authentication tokens"""
     
-    def __init__(self):
+    # (url, params, token hash) -> (etag, body, monotonic expiry), oldest first
+    _etag_cache: Dict[Tuple[str, Tuple, str], Tuple[str, bytes, float]] = {}
+    _etag_cache_bytes = 0
+    
+    def __init__(self, client: Optional[httpx.AsyncClient] = None):
         self.base_url = "https://api.github.com"
-        self.client = httpx.AsyncClient(
+        # HTTP/2 multiplexes GitHub calls over one pooled keep-alive connection
+        self.client = client or httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=20,
+                keepalive_expiry=300
+            ),
             timeout=30.0,
             headers={
                 "Accept": "application/vnd.github.v3+json",
@@ -27,16 +82,65 @@ class GitHubService:
             "User-Agent": "SaasIt.ai/1.0"
         }
     
+    async def _cached_get(
+        self,
+        github_token: str,
+        url: str,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Any:
+        """GET a JSON resource, revalidating a previously seen response with its ETag"""
+        headers = await self.get_authenticated_headers(github_token)
+        # Key on a digest so the cache never holds the token itself
+        cache_key = (
+            url,
+            tuple(sorted((params or {}).items())),
+            hashlib.sha256(github_token.encode()).hexdigest()
+        )
+        
+        cached = self._etag_cache.get(cache_key)
+        if cached and cached[2] <= time.monotonic():
+            self._evict_etag(cache_key)
+            cached = None
+        if cached:
+            headers["If-None-Match"] = cached[0]
+        
+        response = await self.client.get(url, headers=headers, params=params)
+        if cached and response.status_code == 304:
+            # Parse a fresh copy so callers can't mutate each other's results
+            return orjson.loads(cached[1])
+        
+        response.raise_for_status()
+        etag = response.headers.get("ETag")
+        if etag and len(response.content) <= ETAG_CACHE_MAX_BODY_BYTES:
+            self._store_etag(cache_key, etag, response.content)
+        return orjson.loads(response.content)
+    
+    @classmethod
+    def _store_etag(cls, cache_key: Tuple[str, Tuple, str], etag: str, body: bytes):
+        """Cache a response body, evicting the oldest entries until it fits"""
+        cls._evict_etag(cache_key)
+        while cls._etag_cache and cls._etag_cache_bytes + len(body) > ETAG_CACHE_MAX_BYTES:
+            cls._evict_etag(next(iter(cls._etag_cache)))
+        cls._etag_cache[cache_key] = (etag, body, time.monotonic() + ETAG_CACHE_TTL_SECONDS)
+        cls._etag_cache_bytes += len(body)
+    
+    @classmethod
+    def _evict_etag(cls, cache_key: Tuple[str, Tuple, str]):
+        """Drop a cached response, if present"""
+        cached = cls._etag_cache.pop(cache_key, None)
+        if cached:
+            cls._etag_cache_bytes -= len(cached[1])
+    
+    @classmethod
+    def clear_etag_cache(cls):
+        """Drop every cached response"""
+        cls._etag_cache.clear()
+        cls._etag_cache_bytes = 0
+    
     async def get_user_info(self, github_token: str) -> Dict[str, Any]:
         """Get GitHub user information"""
         try:
-            headers = await self.get_authenticated_headers(github_token)
-            response = await self.client.get(
-                f"{self.base_url}/user",
-                headers=headers
-            )
-            response.raise_for_status()
-            return response.json()
+            return await self._cached_get(github_token, f"{self.base_url}/user")
         except httpx.HTTPError as e:
             logger.error(f"Failed to get GitHub user info: {e}")
             raise Exception(f"GitHub API error: {str(e)}")
@@ -49,18 +153,15 @@ class GitHubService:
     ) -> List[Dict[str, Any]]:
         """Get user's GitHub repositories"""
         try:
-            headers = await self.get_authenticated_headers(github_token)
-            response = await self.client.get(
+            return await self._cached_get(
+                github_token,
                 f"{self.base_url}/user/repos",
-                headers=headers,
                 params={
                     "sort": sort,
                     "per_page": per_page,
                     "type": "all"  # owner, collaborator, member
                 }
             )
-            response.raise_for_status()
-            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"Failed to get repositories: {e}")
             raise Exception(f"GitHub API error: {str(e)}")
@@ -72,16 +173,31 @@ class GitHubService:
         repo: str
     ) -> Dict[str, Any]:
         """Get specific repository information"""
+        try:
+            return await self._cached_get(github_token, f"{self.base_url}/repos/{owner}/{repo}")
+        except httpx.HTTPError as e:
+            logger.error(f"Failed to get repository {owner}/{repo}: {e}")
+            raise Exception(f"GitHub API error: {str(e)}")
+    
+    async def get_head_sha(
+        self,
+        github_token: str,
+        owner: str,
+        repo: str
+    ) -> str:
+        """Get the commit SHA of the repository's default branch head"""
         try:
             headers = await self.get_authenticated_headers(github_token)
+            # The sha media type returns just the SHA as plain text
+            headers["Accept"] = "application/vnd.github.sha"
             response = await self.client.get(
-                f"{self.base_url}/repos/{owner}/{repo}",
+                f"{self.base_url}/repos/{owner}/{repo}/commits/HEAD",
                 headers=headers
             )
             response.raise_for_status()
-            return response.json()
+            return response.text.strip()
         except httpx.HTTPError as e:
-            logger.error(f"Failed to get repository {owner}/{repo}: {e}")
+            logger.error(f"Failed to get head commit for {owner}/{repo}: {e}")
             raise Exception(f"GitHub API error: {str(e)}")
     
     async def create_repository(
@@ -148,18 +264,15 @@ class GitHubService:
     ) -> List[Dict[str, Any]]:
         """Get repository contents"""
         try:
-            headers = await self.get_authenticated_headers(github_token)
             params = {}
             if ref:
                 params["ref"] = ref
                 
-            response = await self.client.get(
+            return await self._cached_get(
+                github_token,
                 f"{self.base_url}/repos/{owner}/{repo}/contents/{path}",
-                headers=headers,
                 params=params
             )
-            response.raise_for_status()
-            return response.json()
         except httpx.HTTPError as e:
             logger.error(f"Failed to get repository contents: {e}")
             raise Exception(f"GitHub API error: {str(e)}")
@@ -340,9 +453,10 @@ class GitHubService:
             
             analysis = {
                 "framework": "unknown",
-                "languages": [],
-                "build_tools": [],
-                "package_managers": [],
+                # Collected as sets while scanning, turned into lists once at the end
+                "languages": set(),
+                "build_tools": set(),
+                "package_managers": set(),
                 "test_frameworks": [],
                 "config_files": [],
                 "has_docs": False,
@@ -354,50 +468,63 @@ class GitHubService:
                 }
             }
             
+            source_dirs = []
             for item in contents:
+                name = item["name"]
                 if item["type"] == "file":
-                    filename = item["name"].lower()
-                    analysis["structure"]["files"].append(item["name"])
+                    filename = name.lower()
+                    analysis["structure"]["files"].append(name)
                     
                     # Detect framework and tools
-                    if filename == "package.json":
-                        analysis["package_managers"].append("npm")
-                        # Could fetch and parse package.json for more details
-                    elif filename == "requirements.txt":
-                        analysis["package_managers"].append("pip")
-                    elif filename == "cargo.toml":
-                        analysis["package_managers"].append("cargo")
-                    elif filename == "go.mod":
-                        analysis["package_managers"].append("go")
-                    elif filename in ["dockerfile", "docker-compose.yml"]:
-                        analysis["build_tools"].append("docker")
-                    elif filename in ["readme.md", "readme.rst"]:
-                        analysis["has_docs"] = True
-                    elif item["name"].endswith((".js", ".jsx", ".ts", ".tsx")):
-                        analysis["languages"].append("javascript")
-                    elif item["name"].endswith(".py"):
-                        analysis["languages"].append("python")
-                    elif item["name"].endswith((".go")):
-                        analysis["languages"].append("go")
-                    elif item["name"].endswith((".rs")):
-                        analysis["languages"].append("rust")
+                    marker = ROOT_FILE_MARKERS.get(filename)
+                    if marker:
+                        field, value = marker
+                        if field == "has_docs":
+                            analysis[field] = value
+                        else:
+                            analysis[field].add(value)
+                    else:
+                        language = self._source_language(filename)
+                        if language:
+                            analysis["languages"].add(language)
                         
                 elif item["type"] == "dir":
-                    dirname = item["name"].lower()
-                    analysis["structure"]["directories"].append(item["name"])
+                    dirname = name.lower()
+                    analysis["structure"]["directories"].append(name)
                     
                     if dirname in ["test", "tests", "__tests__", "spec"]:
                         analysis["has_tests"] = True
                     elif dirname == ".github":
                         analysis["has_ci"] = True
                     elif dirname in ["src", "lib", "app"]:
-                        # Could analyze subdirectories
-                        pass
+                        source_dirs.append(name)
+            
+            # The source directory listings and package.json don't depend on each other,
+            # so fetch them concurrently; a failed fetch only loses its own detail
+            fetches = [
+                self.get_repository_contents(github_token, owner, repo, dirname)
+                for dirname in source_dirs
+            ]
+            if "npm" in analysis["package_managers"]:
+                fetches.append(self.get_file_content(github_token, owner, repo, "package.json"))
+            results = await asyncio.gather(*fetches, return_exceptions=True)
+            
+            for dirname, listing in zip(source_dirs, results):
+                if isinstance(listing, Exception):
+                    logger.debug(f"Could not list {dirname} in {owner}/{repo}: {listing}")
+                    continue
+                for item in listing:
+                    if item["type"] == "file":
+                        language = self._source_language(item["name"].lower())
+                        if language:
+                            analysis["languages"].add(language)
             
-            # Remove duplicates
-            analysis["languages"] = list(set(analysis["languages"]))
-            analysis["build_tools"] = list(set(analysis["build_tools"]))
-            analysis["package_managers"] = list(set(analysis["package_managers"]))
+            if len(results) > len(source_dirs):
+                self._apply_package_json(analysis, results[-1])
+            
+            analysis["languages"] = list(analysis["languages"])
+            analysis["build_tools"] = list(analysis["build_tools"])
+            analysis["package_managers"] = list(analysis["package_managers"])
             
             return analysis
             
@@ -405,6 +532,38 @@ class GitHubService:
             logger.error(f"Failed to analyze repository: {e}")
             raise
     
+    @staticmethod
+    def _source_language(name: str) -> Optional[str]:
+        """Language of a source file, judged by the extension of its lowercased name"""
+        return SOURCE_EXTENSIONS.get(os.path.splitext(name)[1])
+    
+    @staticmethod
+    def _apply_package_json(analysis: Dict[str, Any], package_json: Any) -> None:
+        """Fill in framework and test frameworks from package.json dependencies"""
+        if isinstance(package_json, Exception):
+            logger.debug(f"Could not fetch package.json: {package_json}")
+            return
+        try:
+            package = orjson.loads(package_json)
+        except orjson.JSONDecodeError as e:
+            logger.debug(f"Could not parse package.json: {e}")
+            return
+        if not isinstance(package, dict):
+            return
+        
+        dependencies = {}
+        for field in ("dependencies", "devDependencies"):
+            if isinstance(package.get(field), dict):
+                dependencies.update(package[field])
+        
+        for dependency, framework in PACKAGE_FRAMEWORKS:
+            if dependency in dependencies:
+                analysis["framework"] = framework
+                break
+        analysis["test_frameworks"] = [
+            dependency for dependency in PACKAGE_TEST_FRAMEWORKS if dependency in dependencies
+        ]
+    
     async def setup_saasit_workflow(
         self,
         github_token: str,
@@ -0,0 +1,51 @@
+import logging
+from typing import Optional
+from datetime import datetime
+from cryptography.fernet import InvalidToken
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.utils.security import encrypt_secret, decrypt_secret
+
+logger = logging.getLogger(__name__)
+
+
+class GitHubSessionService:
+    """Stores a user's GitHub OAuth token server-side so requests don't have to carry it"""
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        self.sessions_collection = db.github_sessions
+
+    async def store_token(self, user_id: str, github_token: str) -> None:
+        """Encrypt and persist the GitHub token for a user"""
+        now = datetime.utcnow()
+        await self.sessions_collection.update_one(
+            {"_id": user_id},
+            {
+                "$set": {"token": encrypt_secret(github_token), "updated_at": now},
+                "$setOnInsert": {"created_at": now}
+            },
+            upsert=True
+        )
+        logger.info(f"Stored GitHub session for user {user_id}")
+
+    async def get_token(self, user_id: str) -> Optional[str]:
+        """Get the user's GitHub token, or None if no session exists"""
+        # Read on every call rather than cached in memory, so deleting the session
+        # revokes the token for every process at once
+        session = await self.sessions_collection.find_one({"_id": user_id}, {"token": 1})
+        if not session:
+            return None
+
+        try:
+            return decrypt_secret(session["token"])
+        except InvalidToken:
+            # Encrypted under a previous SECRET_KEY; the user has to connect again
+            logger.warning(f"Discarding undecryptable GitHub session for user {user_id}")
+            await self.sessions_collection.delete_one({"_id": user_id})
+            return None
+
+    async def delete_token(self, user_id: str) -> bool:
+        """Remove the user's GitHub session"""
+        result = await self.sessions_collection.delete_one({"_id": user_id})
+        return result.deleted_count > 0
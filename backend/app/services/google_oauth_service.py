@@ -1,6 +1,7 @@
 from typing import Optional, Dict, Any
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
 from fastapi import HTTPException, status
 import logging
 from urllib.parse import urlencode, parse_qs
@@ -429,7 +430,7 @@ class GoogleOAuthService:
         # Create user document
         user_in_db = UserInDB(
             **user_create.model_dump(exclude={'password'}),
-            _id=str(datetime.utcnow().timestamp()).replace(".", ""),
+            _id=str(ObjectId()),
             hashed_password=None,  # No password for Google OAuth users
             is_verified=google_user.verified_email,
             created_at=datetime.utcnow(),
@@ -9,6 +9,7 @@ import os
 import json
 import asyncio
 import logging
+import time
 from typing import Dict, List, Optional, Any, Tuple
 from pathlib import Path
 import re
@@ -18,6 +19,14 @@ from app.services.github_service import GitHubService
 
 logger = logging.getLogger(__name__)
 
+# Repository structure analyses keyed by (owner, repo, head SHA); the SHA pins the
+# content, the TTL bounds memory held for repositories nobody asks about again
+STRUCTURE_CACHE_TTL_SECONDS = 600
+STRUCTURE_CACHE_MAX_ENTRIES = 1000
+
+# Key files read for technology detection; limits the GitHub calls per analysis
+KEY_FILES_LIMIT = 20
+
 
 class ProjectIntelligence:
     """
@@ -25,6 +34,8 @@ class ProjectIntelligence:
     for AI agent selection and workflow optimization.
     """
     
+    _structure_cache: Dict[Tuple[str, str, str], Tuple[Dict[str, Any], float]] = {}  # key -> (structure, expires_at)
+
     def __init__(self, github_service: GitHubService = None):
         self.github_service = github_service or GitHubService()
         
@@ -182,9 +193,7 @@ class ProjectIntelligence:
             logger.info(f"Starting repository analysis for {owner}/{repo}")
             
             # Get repository structure and content
-            repo_structure = await self.github_service.analyze_repository_structure(
-                github_token, owner, repo
-            )
+            repo_structure = await self.get_repository_structure(github_token, owner, repo)
             
             # Detect technologies and frameworks
             technologies = await self._detect_technologies(
@@ -196,8 +205,8 @@ class ProjectIntelligence:
                 github_token, owner, repo, technologies
             )
             
-            # Generate AI agent recommendations
-            agent_recommendations = self._generate_agent_recommendations(
+            # Generate AI agent recommendations and the overall confidence
+            agent_recommendations, confidence_score = self._recommend_agents(
                 technologies, code_patterns
             )
             
@@ -223,9 +232,7 @@ class ProjectIntelligence:
                 "complexity": complexity_analysis,
                 "agent_recommendations": agent_recommendations,
                 "enhancement_suggestions": enhancement_suggestions,
-                "confidence_score": self._calculate_confidence_score(
-                    technologies, code_patterns
-                )
+                "confidence_score": confidence_score
             }
             
             logger.info(f"Repository analysis completed for {owner}/{repo}")
@@ -235,6 +242,35 @@ class ProjectIntelligence:
             logger.error(f"Failed to analyze repository {owner}/{repo}: {e}")
             raise
 
+    async def get_repository_structure(
+        self,
+        github_token: str,
+        owner: str,
+        repo: str
+    ) -> Dict[str, Any]:
+        """Get the repository structure analysis, cached per head commit."""
+        # Resolving the SHA with the caller's token also enforces their access to the repo
+        head_sha = await self.github_service.get_head_sha(github_token, owner, repo)
+        cache_key = (owner.lower(), repo.lower(), head_sha)
+        
+        cached = self._structure_cache.get(cache_key)
+        if cached and cached[1] > time.monotonic():
+            return cached[0]
+        
+        structure = await self.github_service.analyze_repository_structure(
+            github_token, owner, repo
+        )
+        
+        if len(self._structure_cache) >= STRUCTURE_CACHE_MAX_ENTRIES:
+            now = time.monotonic()
+            for key in [k for k, (_, expires_at) in self._structure_cache.items() if expires_at <= now]:
+                del self._structure_cache[key]
+            if len(self._structure_cache) >= STRUCTURE_CACHE_MAX_ENTRIES:
+                self._structure_cache.clear()
+        self._structure_cache[cache_key] = (structure, time.monotonic() + STRUCTURE_CACHE_TTL_SECONDS)
+        
+        return structure
+
     async def _detect_technologies(
         self, 
         github_token: str, 
@@ -338,21 +374,28 @@ class ProjectIntelligence:
         
         return patterns
 
-    def _generate_agent_recommendations(
+    def _recommend_agents(
         self, 
         technologies: Dict[str, Any], 
         patterns: Dict[str, Any]
-    ) -> List[Dict[str, Any]]:
-        """Generate AI agent recommendations based on detected technologies and patterns."""
+    ) -> Tuple[List[Dict[str, Any]], float]:
+        """
+        Generate AI agent recommendations and the overall confidence score.
+        Both are built from a single walk over the detected technologies.
+        """
         recommendations = []
         agent_scores = defaultdict(int)
         reasoning = defaultdict(list)
+        tech_confidence_total = 0.0
+        tech_count = 0
         
         # Score agents based on detected technologies
         detected_techs = technologies.get("detected", {})
         for tech_name, tech_info in detected_techs.items():
             if tech_info.get("detected", False):
                 confidence = tech_info.get("confidence", 0)
+                tech_confidence_total += confidence
+                tech_count += 1
                 for agent in self.agent_recommendations.get(tech_name, []):
                     agent_scores[agent] += confidence * 10
                     reasoning[agent].append(f"Detected {tech_name} (confidence: {confidence:.1f})")
@@ -384,7 +427,15 @@ class ProjectIntelligence:
                     "category": self._get_agent_category(agent)
                 })
         
-        return recommendations[:10]  # Return top 10 recommendations
+        # Overall confidence: detected technology confidence weighted with pattern completeness
+        if tech_count:
+            avg_tech_confidence = tech_confidence_total / tech_count
+            pattern_completeness = sum(1 for p in patterns.values() if p) / max(len(patterns), 1)
+            confidence_score = avg_tech_confidence * 0.7 + pattern_completeness * 0.3
+        else:
+            confidence_score = 0.0
+        
+        return recommendations[:10], confidence_score  # Return top 10 recommendations
 
     def _generate_enhancement_suggestions(
         self, 
@@ -472,26 +523,34 @@ class ProjectIntelligence:
         ]
         
         try:
-            for file_info in structure.get("files", []):
-                file_path = file_info.get("path", "")
-                file_name = os.path.basename(file_path)
+            candidate_paths = [
+                file_info.get("path", "")
+                for file_info in structure.get("files", [])
+                if os.path.basename(file_info.get("path", "")) in important_files or any(
+                    pattern in file_info.get("path", "")
+                    for pattern in [".config.", ".json", ".yaml", ".yml"]
+                )
+            ]
+            
+            # The file fetches are independent, so issue them concurrently; each batch
+            # asks only for as many files as are still missing, so failed fetches are
+            # backfilled from later candidates without going past the limit
+            while candidate_paths and len(key_files) < KEY_FILES_LIMIT:
+                batch = candidate_paths[:KEY_FILES_LIMIT - len(key_files)]
+                candidate_paths = candidate_paths[len(batch):]
+                contents = await asyncio.gather(
+                    *(
+                        self.github_service.get_file_content(github_token, owner, repo, file_path)
+                        for file_path in batch
+                    ),
+                    return_exceptions=True
+                )
                 
-                if file_name in important_files or any(
-                    pattern in file_path for pattern in [".config.", ".json", ".yaml", ".yml"]
-                ):
-                    try:
-                        content = await self.github_service.get_file_content(
-                            github_token, owner, repo, file_path
-                        )
-                        key_files[file_path] = content
-                        
-                        # Limit to prevent excessive API calls
-                        if len(key_files) >= 20:
-                            break
-                            
-                    except Exception as e:
-                        logger.debug(f"Could not get content for {file_path}: {e}")
+                for file_path, content in zip(batch, contents):
+                    if isinstance(content, Exception):
+                        logger.debug(f"Could not get content for {file_path}: {content}")
                         continue
+                    key_files[file_path] = content
         except Exception as e:
             logger.warning(f"Error getting key files content: {e}")
         
@@ -771,26 +830,6 @@ class ProjectIntelligence:
         
         return complexity
 
-    def _calculate_confidence_score(
-        self, 
-        technologies: Dict[str, Any], 
-        patterns: Dict[str, Any]
-    ) -> float:
-        """Calculate overall confidence score for the analysis."""
-        tech_confidences = [
-            info.get("confidence", 0) 
-            for info in technologies.get("detected", {}).values() 
-            if info.get("detected", False)
-        ]
-        
-        if not tech_confidences:
-            return 0.0
-        
-        avg_tech_confidence = sum(tech_confidences) / len(tech_confidences)
-        pattern_completeness = len([p for p in patterns.values() if p]) / max(len(patterns), 1)
-        
-        return (avg_tech_confidence * 0.7 + pattern_completeness * 0.3)
-
     def _suggest_test_framework(self, technologies: Dict[str, Any]) -> str:
         """Suggest appropriate test framework based on detected technologies."""
         detected_names = [name for name, info in technologies.items() if info.get("detected")]
@@ -1,5 +1,6 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
+import base64
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from fastapi import HTTPException, status
 import logging
@@ -81,9 +82,10 @@ class ProjectService:
         user_id: str, 
         skip: int = 0, 
         limit: int = 50,
-        status_filter: Optional[ProjectStatus] = None
+        status_filter: Optional[ProjectStatus] = None,
+        page_cursor: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Get all projects for a user with pagination"""
+        """Get all projects for a user with pagination (offset or keyset via page_cursor)"""
         query = {"user_id": user_id}
         if status_filter:
             query["status"] = status_filter
@@ -91,17 +93,57 @@ class ProjectService:
         # Get total count
         total = await self.projects_collection.count_documents(query)
         
+        # Keyset pagination seeks straight to the cursor instead of walking skipped documents
+        page_query = dict(query)
+        if page_cursor:
+            created_at, project_id = self._decode_page_cursor(page_cursor)
+            page_query["$or"] = [
+                {"created_at": {"$lt": created_at}},
+                {"created_at": created_at, "_id": {"$lt": project_id}}
+            ]
+            skip = 0
+        
         # Get projects with pagination
-        cursor = self.projects_collection.find(query).sort("created_at", -1).skip(skip).limit(limit)
+        cursor = (
+            self.projects_collection.find(page_query)
+            .sort([("created_at", -1), ("_id", -1)])
+            .skip(skip)
+            .limit(limit)
+        )
         projects = await cursor.to_list(length=limit)
         
+        next_cursor = None
+        if len(projects) == limit:
+            next_cursor = self._encode_page_cursor(projects[-1]["created_at"], projects[-1]["_id"])
+        
         return {
             "projects": [Project(**ProjectInDB(**proj).model_dump()) for proj in projects],
             "total": total,
-            "page": skip // limit + 1,
-            "page_size": limit
+            # Page numbers aren't known when paging by cursor
+            "page": None if page_cursor else skip // limit + 1,
+            "page_size": limit,
+            "next_cursor": next_cursor
         }
     
+    @staticmethod
+    def _encode_page_cursor(created_at: datetime, project_id: str) -> str:
+        """Encode the sort key of the last project on a page as an opaque cursor"""
+        raw = f"{created_at.isoformat()}|{project_id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def _decode_page_cursor(page_cursor: str) -> Tuple[datetime, str]:
+        """Decode a cursor produced by _encode_page_cursor"""
+        try:
+            raw = base64.urlsafe_b64decode(page_cursor.encode()).decode()
+            created_at, project_id = raw.split("|", 1)
+            return datetime.fromisoformat(created_at), project_id
+        except (ValueError, UnicodeDecodeError):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid pagination cursor"
+            )
+    
     async def get_project(self, project_id: str, user_id: str) -> Project:
         """Get a specific project"""
         project_doc = await self.projects_collection.find_one({
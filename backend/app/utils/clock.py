@@ -0,0 +1,41 @@
+"""
+Cached wall clock for hot-path timestamps that only need millisecond resolution
+"""
+from datetime import datetime
+import time
+
+# How long a cached reading is reused
+CLOCK_RESOLUTION_NS = 1_000_000
+
+
+class Clock:
+    """Serves datetime.utcnow(), refreshing the cached value at most once per millisecond"""
+    __slots__ = ("_refreshed_at_ns", "_now", "_isoformat")
+
+    def __init__(self):
+        self._refreshed_at_ns = 0
+        self._now: datetime = datetime.utcnow()
+        self._isoformat: str = ""
+
+    def now(self) -> datetime:
+        """Current UTC time (naive, like datetime.utcnow()), at most 1 ms stale"""
+        now_ns = time.monotonic_ns()
+        if now_ns - self._refreshed_at_ns >= CLOCK_RESOLUTION_NS:
+            self._refreshed_at_ns = now_ns
+            self._now = datetime.utcnow()
+            self._isoformat = ""
+        return self._now
+
+    def isoformat(self) -> str:
+        """
+        now() in ISO 8601 with an explicit +00:00 offset, the way orjson writes naive UTC
+        datetimes with OPT_NAIVE_UTC; formatted once per refresh
+        """
+        now = self.now()
+        if not self._isoformat:
+            self._isoformat = now.isoformat() + "+00:00"
+        return self._isoformat
+
+
+# Shared process-wide clock
+CLOCK = Clock()
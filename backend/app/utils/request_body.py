@@ -0,0 +1,54 @@
+"""
+msgspec- and orjson-backed request body decoding for FastAPI routes
+"""
+from typing import Any, Callable, Type, TypeVar
+from fastapi import HTTPException, Request
+from fastapi.routing import APIRoute
+import msgspec
+import orjson
+
+T = TypeVar("T", bound=msgspec.Struct)
+
+
+def msgspec_body(struct_type: Type[T]) -> Callable:
+    """
+    Build a dependency that decodes and validates the raw JSON body into a msgspec Struct.
+    Use as `payload: Model = Depends(msgspec_body(Model))`.
+    """
+    decoder = msgspec.json.Decoder(struct_type)
+
+    async def dependency(request: Request) -> T:
+        try:
+            return decoder.decode(await request.body())
+        except msgspec.ValidationError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except msgspec.DecodeError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+
+    return dependency
+
+
+class ORJSONRequest(Request):
+    """Request whose JSON body is parsed with orjson instead of the stdlib json module"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            # orjson.JSONDecodeError subclasses json.JSONDecodeError, so FastAPI still
+            # turns malformed bodies into its usual 422 response
+            self._json = orjson.loads(await self.body())
+        return self._json
+
+
+class ORJSONRoute(APIRoute):
+    """
+    Route class that decodes JSON bodies with orjson before Pydantic validation.
+    Use as `APIRouter(route_class=ORJSONRoute)`.
+    """
+
+    def get_route_handler(self) -> Callable:
+        original_handler = super().get_route_handler()
+
+        async def orjson_route_handler(request: Request):
+            return await original_handler(ORJSONRequest(request.scope, request.receive))
+
+        return orjson_route_handler
@@ -2,13 +2,36 @@ from datetime import datetime, timedelta
 from typing import Optional, Union
 from jose import JWTError, jwt
 from passlib.context import CryptContext
+from cryptography.fernet import Fernet
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import base64
+import hashlib
+import os
 import secrets
 import string
 from app.config import settings
 
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: one module-level context, pinned to bcrypt $2b$ with a fixed cost so
+# passlib does not re-derive settings per call and hash time is the same on every worker
+BCRYPT_ROUNDS = 12
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__ident="2b"
+)
+
+# bcrypt is deliberately slow; it runs on its own threads so it neither blocks the
+# event loop nor starves the default executor used by Motor
+_password_executor = ThreadPoolExecutor(
+    max_workers=(os.cpu_count() or 1) * 2,
+    thread_name_prefix="password-hash"
+)
+
+# Symmetric encryption for secrets stored at rest (e.g. GitHub tokens)
+_fernet = Fernet(base64.urlsafe_b64encode(hashlib.sha256(settings.secret_key.encode()).digest()))
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -56,6 +79,28 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password against a hash without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, get_password_hash, password)
+
+
+def encrypt_secret(value: str) -> str:
+    """Encrypt a secret for storage"""
+    return _fernet.encrypt(value.encode()).decode()
+
+
+def decrypt_secret(token: str) -> str:
+    """Decrypt a secret previously encrypted with encrypt_secret"""
+    return _fernet.decrypt(token.encode()).decode()
+
+
 def generate_random_token(length: int = 32) -> str:
     """Generate a random token for email verification or password reset"""
     alphabet = string.ascii_letters + string.digits
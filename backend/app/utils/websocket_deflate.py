@@ -0,0 +1,70 @@
+"""
+uvicorn WebSocket protocol with a memory-bounded permessage-deflate configuration
+"""
+from typing import Any, Sequence, Tuple, List
+from uvicorn.protocols.websockets.websockets_impl import WebSocketProtocol
+from websockets.extensions.permessage_deflate import (
+    PerMessageDeflate,
+    ServerPerMessageDeflateFactory,
+)
+from websockets.frames import Frame, Opcode
+
+# 4 KB compression windows and a small zlib memLevel keep each connection's
+# deflate state to a few tens of KB instead of ~320 KB with zlib defaults
+DEFLATE_WINDOW_BITS = 12
+DEFLATE_MEM_LEVEL = 5
+
+# Messages smaller than this are sent uncompressed; deflate framing overhead
+# outweighs the savings on tiny control replies
+DEFLATE_MIN_MESSAGE_BYTES = 1024
+
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """permessage-deflate that leaves small, unfragmented messages uncompressed"""
+
+    def encode(self, frame: Frame) -> Frame:
+        # RFC 7692 allows any message to be sent uncompressed (RSV1 unset); the
+        # compression context is untouched, so later messages are unaffected
+        if (
+            frame.fin
+            and frame.opcode in (Opcode.TEXT, Opcode.BINARY)
+            and len(frame.data) < DEFLATE_MIN_MESSAGE_BYTES
+        ):
+            return frame
+        return super().encode(frame)
+
+
+class ThresholdPerMessageDeflateFactory(ServerPerMessageDeflateFactory):
+    """Negotiates permessage-deflate as usual but hands out ThresholdPerMessageDeflate"""
+
+    def process_request_params(
+        self,
+        params: Sequence[Tuple[str, Any]],
+        accepted_extensions: Sequence[Any],
+    ) -> Tuple[List[Tuple[str, Any]], PerMessageDeflate]:
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+        return response_params, ThresholdPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            self.compress_settings,
+        )
+
+
+class DeflateWebSocketProtocol(WebSocketProtocol):
+    """
+    uvicorn's websockets protocol with bounded deflate windows and a size threshold.
+    Pass as `uvicorn.run(..., ws=DeflateWebSocketProtocol)`.
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        if self.config.ws_per_message_deflate:
+            self.available_extensions = [
+                ThresholdPerMessageDeflateFactory(
+                    server_max_window_bits=DEFLATE_WINDOW_BITS,
+                    client_max_window_bits=DEFLATE_WINDOW_BITS,
+                    compress_settings={"memLevel": DEFLATE_MEM_LEVEL},
+                )
+            ]
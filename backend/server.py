@@ -1,5 +1,6 @@
 from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Request, Depends
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -70,6 +71,7 @@ async def create_database_indexes(db):
             # Password reset indexes
             IndexModel("password_reset_token", sparse=True, name="password_reset_token_sparse"),
             IndexModel("password_reset_expires", sparse=True, name="password_reset_expires_sparse"),
+            IndexModel([("password_reset_token", 1), ("password_reset_expires", 1)], sparse=True, name="password_reset_token_expires_compound"),
             
             # Subscription tier index for user management
             IndexModel("subscription.tier", name="subscription_tier_index")
@@ -81,8 +83,13 @@ async def create_database_indexes(db):
         
         # Projects collection indexes
         projects_indexes = [
-            # Existing compound index for user projects
-            IndexModel([("user_id", 1), ("created_at", -1)], name="user_id_created_at_compound"),
+            # User project listings sort on (created_at, _id), so the cursor pagination
+            # seeks through the index instead of sorting every project the user owns
+            IndexModel([("user_id", 1), ("created_at", -1), ("_id", -1)], name="user_id_created_at_id_compound"),
+            IndexModel(
+                [("user_id", 1), ("status", 1), ("created_at", -1), ("_id", -1)],
+                name="user_id_status_created_at_id_compound"
+            ),
             
             # Additional project indexes
             IndexModel("user_id", name="user_id_index"),
@@ -91,6 +98,12 @@ async def create_database_indexes(db):
             IndexModel("status", name="project_status_index")
         ]
         
+        # Drop the indexes these replace; each is a prefix of its replacement
+        existing_project_indexes = await db.projects.index_information()
+        for superseded in ("user_id_created_at_compound", "user_id_status_created_at_compound"):
+            if superseded in existing_project_indexes:
+                await db.projects.drop_index(superseded)
+        
         # Create projects indexes
         await db.projects.create_indexes(projects_indexes)
         logger.info("Created projects collection indexes")
@@ -112,20 +125,50 @@ async def create_database_indexes(db):
             IndexModel("status", name="executions_status_index"),
             IndexModel("created_at", name="executions_created_at_index"),
             IndexModel("updated_at", name="executions_updated_at_index"),
-            IndexModel("workflow_id", sparse=True, name="workflow_id_sparse_index")
+            IndexModel("workflow_id", sparse=True, name="workflow_id_sparse_index"),
+            # cleanup_old_executions: status $in (equality) then created_at range
+            IndexModel([("status", 1), ("created_at", 1)], name="executions_status_created_at_compound")
         ]
         
         # Create executions indexes
         await db.executions.create_indexes(executions_indexes)
         logger.info("Created executions collection indexes")
         
+        # Execution queue indexes (workers claim the oldest unclaimed or lapsed job)
+        execution_queue_indexes = [
+            IndexModel([("claimed_at", 1), ("enqueued_at", 1)], name="execution_queue_claimed_at_enqueued_at_compound")
+        ]
+        
+        # Create execution queue indexes
+        await db.execution_queue.create_indexes(execution_queue_indexes)
+        logger.info("Created execution_queue collection indexes")
+        
+        # Execution steps collection indexes (steps are stored apart from their execution)
+        execution_steps_indexes = [
+            IndexModel([("execution_id", 1), ("order", 1)], name="execution_id_order_compound")
+        ]
+        
+        # Create execution steps indexes
+        await db.execution_steps.create_indexes(execution_steps_indexes)
+        logger.info("Created execution_steps collection indexes")
+        
+        # Terminal outputs live in a time-series collection bucketed by execution, which
+        # expires old output itself instead of cleanup_old_executions scanning for it
+        from app.services.execution_service import TERMINAL_OUTPUT_RETENTION_DAYS
+        terminal_outputs_options = await db.terminal_outputs.options()
+        if not terminal_outputs_options:
+            await db.create_collection(
+                "terminal_outputs",
+                timeseries={"timeField": "timestamp", "metaField": "execution_id", "granularity": "seconds"},
+                expireAfterSeconds=TERMINAL_OUTPUT_RETENTION_DAYS * 86400
+            )
+            logger.info("Created terminal_outputs time-series collection")
+        elif "timeseries" not in terminal_outputs_options:
+            logger.warning("terminal_outputs is not a time-series collection - old output will not expire until it is recreated")
+        
         # Terminal outputs collection indexes
         terminal_outputs_indexes = [
-            IndexModel([("execution_id", 1), ("timestamp", 1)], name="execution_id_timestamp_compound"),
-            IndexModel("execution_id", name="terminal_execution_id_index"),
-            IndexModel("step_id", sparse=True, name="terminal_step_id_sparse_index"),
-            IndexModel("timestamp", name="terminal_timestamp_index"),
-            IndexModel("type", name="terminal_type_index")
+            IndexModel([("execution_id", 1), ("timestamp", 1)], name="execution_id_timestamp_compound")
         ]
         
         # Create terminal outputs indexes
@@ -144,6 +187,17 @@ async def create_database_indexes(db):
         await db.onboarding_progress.create_indexes(onboarding_indexes)
         logger.info("Created onboarding_progress collection indexes")
         
+        # Repository analysis jobs collection indexes
+        from app.services.analysis_job_service import ANALYSIS_JOB_TTL_SECONDS
+        analysis_jobs_indexes = [
+            IndexModel("created_at", expireAfterSeconds=ANALYSIS_JOB_TTL_SECONDS, name="analysis_jobs_created_at_ttl"),
+            IndexModel([("owner", 1), ("repo", 1), ("head_sha", 1), ("status", 1)], name="analysis_jobs_commit_status_compound")
+        ]
+        
+        # Create repository analysis jobs indexes
+        await db.repository_analysis_jobs.create_indexes(analysis_jobs_indexes)
+        logger.info("Created repository_analysis_jobs collection indexes")
+        
         logger.info("All database indexes created successfully")
         
     except Exception as e:
@@ -160,6 +214,18 @@ db = None
 async def lifespan(app: FastAPI):
     # Startup
     global client, db
+    
+    loop_module = type(asyncio.get_running_loop()).__module__
+    if not loop_module.startswith("uvloop"):
+        logger.warning(f"Running on {loop_module} event loop; install uvloop and httptools (requirements.txt) for production")
+    
+    # Shared GitHub client, connected once and reused by every request
+    from app.services.github_service import GitHubService
+    app.state.github_service = GitHubService()
+    
+    # Fire-and-forget database writes, drained before the client closes
+    app.state.background_writes = set()
+    
     try:
         # Skip MongoDB connection if environment variable is set
         if os.getenv("SKIP_DB_CONNECTION", "false").lower() == "true":
@@ -177,6 +243,7 @@ async def lifespan(app: FastAPI):
             from app.services.execution_service import ExecutionService
             from app.routers.websocket import set_execution_service
             execution_service = ExecutionService(db)
+            execution_service.start_workers(settings.execution_workers)
             set_execution_service(execution_service)
             app.state.execution_service = execution_service
             
@@ -190,6 +257,16 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    execution_service = getattr(app.state, "execution_service", None)
+    if execution_service:
+        await execution_service.stop_workers()
+    
+    await app.state.github_service.close()
+    await onboarding.close_http_client()
+    
+    if app.state.background_writes:
+        await asyncio.gather(*app.state.background_writes, return_exceptions=True)
+    
     if client:
         client.close()
         logger.info("Disconnected from MongoDB")
@@ -199,7 +276,8 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title=settings.app_name,
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Create API routers
@@ -520,9 +598,12 @@ app.include_router(legacy_api_router)  # Legacy support
 
 if __name__ == "__main__":
     import uvicorn
+    from app.utils.websocket_deflate import DeflateWebSocketProtocol
+    # loop/http default to "auto", which picks uvloop and httptools when installed
     uvicorn.run(
         "server:app",
         host="0.0.0.0",
         port=8000,
+        ws=DeflateWebSocketProtocol,
         reload=settings.debug
     )
@@ -54,6 +54,9 @@ async def test_db(db_client: AsyncIOMotorClient) -> AsyncGenerator[AsyncIOMotorD
     await db.status_checks.delete_many({})
     await db.onboarding_progress.delete_many({})
     await db.workflow_executions.delete_many({})
+    await db.executions.delete_many({})
+    await db.execution_steps.delete_many({})
+    await db.github_sessions.delete_many({})
     
     yield db
     
@@ -63,6 +66,9 @@ async def test_db(db_client: AsyncIOMotorClient) -> AsyncGenerator[AsyncIOMotorD
     await db.status_checks.delete_many({})
     await db.onboarding_progress.delete_many({})
     await db.workflow_executions.delete_many({})
+    await db.executions.delete_many({})
+    await db.execution_steps.delete_many({})
+    await db.github_sessions.delete_many({})
 
 
 @pytest.fixture
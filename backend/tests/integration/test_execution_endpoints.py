@@ -0,0 +1,32 @@
+"""
+Integration tests for execution endpoints
+"""
+import uuid
+import pytest
+from app.models.execution import WorkflowExecution, ExecutionStatus
+
+
+async def _insert_execution(test_db, user_id: str, status: ExecutionStatus) -> None:
+    """Insert an execution document owned by user_id"""
+    execution = WorkflowExecution(id=str(uuid.uuid4()), user_id=user_id, workflow_name="Test Workflow", status=status)
+    await test_db.executions.insert_one({**execution.model_dump(), "_id": execution.id})
+
+
+class TestExecutionEndpoints:
+    """Test execution API endpoints"""
+    
+    @pytest.mark.asyncio
+    async def test_count_executions(self, sync_client, test_db, registered_user, auth_headers):
+        """Test counting the user's executions, with and without a status filter"""
+        user_id = registered_user["user"]["id"]
+        await _insert_execution(test_db, user_id, ExecutionStatus.COMPLETED)
+        await _insert_execution(test_db, user_id, ExecutionStatus.FAILED)
+        await _insert_execution(test_db, "someone-else", ExecutionStatus.COMPLETED)
+        
+        response = sync_client.get("/api/v1/executions/count", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == {"total": 2}
+        
+        response = sync_client.get("/api/v1/executions/count?status=completed", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == {"total": 1}
@@ -0,0 +1,70 @@
+"""
+Integration tests for GitHub endpoints
+"""
+import httpx
+import pytest
+from server import app
+from app.routers.github import get_github_service
+from app.services.github_service import GitHubService
+
+
+@pytest.fixture
+def github_requests():
+    """Route GitHub calls to a stub API and collect the requests it receives"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"login": "octocat"})
+
+    github_service = GitHubService(httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    app.dependency_overrides[get_github_service] = lambda: github_service
+    yield requests
+    app.dependency_overrides.pop(get_github_service, None)
+
+
+class TestGitHubEndpoints:
+    """Test the stored GitHub session flow"""
+    
+    def test_session_is_used_for_github_calls(self, sync_client, auth_headers, github_requests):
+        """Test that a stored token is sent on later GitHub calls"""
+        response = sync_client.post(
+            "/api/v1/github/session",
+            json={"github_token": "gho_test_token"},
+            headers=auth_headers
+        )
+        assert response.status_code == 200
+        assert response.json() == {"connected": True}
+        
+        response = sync_client.post("/api/v1/github/user", headers=auth_headers)
+        
+        assert response.status_code == 200
+        assert response.json()["user"]["login"] == "octocat"
+        assert github_requests[0].headers["Authorization"] == "Bearer gho_test_token"
+    
+    def test_github_calls_require_session(self, sync_client, auth_headers, github_requests):
+        """Test that GitHub calls are refused once the session is deleted"""
+        sync_client.post("/api/v1/github/session", json={"github_token": "gho_test_token"}, headers=auth_headers)
+        
+        response = sync_client.delete("/api/v1/github/session", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json()["deleted"] is True
+        
+        response = sync_client.post("/api/v1/github/user", headers=auth_headers)
+        
+        assert response.status_code == 400
+        assert github_requests == []
+    
+    @pytest.mark.asyncio
+    async def test_undecryptable_session_is_discarded(
+        self, sync_client, test_db, registered_user, auth_headers, github_requests
+    ):
+        """Test that a token encrypted under another SECRET_KEY reads as not connected"""
+        user_id = registered_user["user"]["id"]
+        await test_db.github_sessions.insert_one({"_id": user_id, "token": "not-a-fernet-token"})
+        
+        response = sync_client.post("/api/v1/github/user", headers=auth_headers)
+        
+        assert response.status_code == 400
+        assert await test_db.github_sessions.find_one({"_id": user_id}) is None
+        assert github_requests == []
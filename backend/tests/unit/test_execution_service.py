@@ -0,0 +1,98 @@
+"""
+Unit tests for ExecutionService
+"""
+import uuid
+import pytest
+from app.services.execution_service import ExecutionService
+from app.models.execution import WorkflowExecution, ExecutionStep, StepStatus, ExecutionStatus
+
+
+async def _create_execution(test_db, **fields) -> str:
+    """Insert a bare execution document and return its id"""
+    execution_id = str(uuid.uuid4())
+    execution = WorkflowExecution(id=execution_id, user_id="test-user", workflow_name="Test Workflow", **fields)
+    await test_db.executions.insert_one({**execution.model_dump(), "_id": execution_id})
+    return execution_id
+
+
+class TestExecutionService:
+    """Test cases for execution step persistence"""
+    
+    @pytest.mark.asyncio
+    async def test_update_execution_step_persists_fields(self, test_db):
+        """Test that a step update actually changes the stored step"""
+        execution_service = ExecutionService(test_db)
+        execution_id = await _create_execution(test_db)
+        step = ExecutionStep(name="Build", agent_type="rapid-prototyper", status=StepStatus.RUNNING)
+        await execution_service.add_execution_step(execution_id, step)
+        
+        updated = await execution_service.update_execution_step(execution_id, step.id, {
+            "progress": 40,
+            "output": "halfway"
+        })
+        
+        assert updated is True
+        step_in_db = await test_db.execution_steps.find_one({"_id": step.id})
+        assert step_in_db["progress"] == 40
+        assert step_in_db["output"] == "halfway"
+        assert step_in_db["updated_at"] is not None
+        
+        execution = await execution_service.get_execution(execution_id, "test-user")
+        assert execution.steps[0].progress == 40
+    
+    @pytest.mark.asyncio
+    async def test_update_unknown_execution_step(self, test_db):
+        """Test updating a step that doesn't exist"""
+        execution_service = ExecutionService(test_db)
+        execution_id = await _create_execution(test_db)
+        
+        updated = await execution_service.update_execution_step(execution_id, "missing-step", {"progress": 10})
+        
+        assert updated is False
+    
+    @pytest.mark.asyncio
+    async def test_cancelled_execution_is_not_completed(self, test_db):
+        """Test that a workflow picked up after a cancel leaves the execution cancelled"""
+        execution_service = ExecutionService(test_db)
+        execution_id = await _create_execution(test_db, status=ExecutionStatus.CANCELLED)
+        
+        await execution_service._execute_workflow(execution_id, {"nodes": []})
+        
+        execution = await execution_service.get_execution(execution_id, "test-user")
+        assert execution.status == ExecutionStatus.CANCELLED
+    
+    @pytest.mark.asyncio
+    async def test_pause_without_local_workflow(self, test_db):
+        """Test that pausing works from a service instance that isn't running the workflow"""
+        execution_service = ExecutionService(test_db)
+        execution_id = await _create_execution(test_db, status=ExecutionStatus.RUNNING)
+        
+        assert await execution_service.pause_execution(execution_id) is True
+        assert await execution_service.pause_execution(execution_id) is False
+    
+    @pytest.mark.asyncio
+    async def test_delete_execution_removes_steps_and_cached_read(self, test_db):
+        """Test that deleting an execution removes its steps and isn't undone by the read cache"""
+        execution_service = ExecutionService(test_db)
+        execution_id = await _create_execution(test_db, status=ExecutionStatus.COMPLETED)
+        await execution_service.add_execution_step(execution_id, ExecutionStep(name="Build", agent_type="rapid-prototyper"))
+        assert await execution_service.get_execution(execution_id, "test-user") is not None
+        
+        assert await execution_service.delete_execution(execution_id) is True
+        
+        assert await execution_service.get_execution(execution_id, "test-user") is None
+        assert await test_db.execution_steps.count_documents({"execution_id": execution_id}) == 0
+        assert await execution_service.delete_execution(execution_id) is False
+    
+    @pytest.mark.asyncio
+    async def test_duplicate_node_ids_fail_execution(self, test_db):
+        """Test that a workflow whose nodes share an id fails instead of running one node twice"""
+        execution_service = ExecutionService(test_db)
+        execution_id = await _create_execution(test_db, status=ExecutionStatus.STARTING)
+        
+        await execution_service._execute_workflow(execution_id, {"nodes": [{"id": "a"}, {"id": "a"}]})
+        
+        execution = await execution_service.get_execution(execution_id, "test-user")
+        assert execution.status == ExecutionStatus.FAILED
+        assert execution.error_message == "Workflow has duplicate node ids"
+        assert await test_db.execution_steps.count_documents({"execution_id": execution_id}) == 0
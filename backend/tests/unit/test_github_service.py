@@ -0,0 +1,124 @@
+"""
+Unit tests for GitHubService
+"""
+import base64
+import httpx
+import pytest
+from app.services import github_service as github_service_module
+from app.services.github_service import GitHubService
+
+
+def _github_client(requests: list) -> httpx.AsyncClient:
+    """Client whose transport serves /user with an ETag and honours If-None-Match"""
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304, headers={"ETag": '"v1"'})
+        return httpx.Response(200, headers={"ETag": '"v1"'}, json={"login": "octocat"})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _repository_client() -> httpx.AsyncClient:
+    """Client serving a small repository whose lib/ listing fails"""
+    package_json = b'{"dependencies": {"next": "14", "react": "18"}, "devDependencies": {"jest": "29"}}'
+    responses = {
+        "/repos/o/r/contents/": [
+            {"type": "file", "name": "package.json"},
+            {"type": "dir", "name": "src"},
+            {"type": "dir", "name": "lib"}
+        ],
+        "/repos/o/r/contents/src": [{"type": "file", "name": "index.tsx"}],
+        "/repos/o/r/contents/package.json": {"content": base64.b64encode(package_json).decode()}
+    }
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path in responses:
+            return httpx.Response(200, json=responses[request.url.path])
+        return httpx.Response(404)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+class TestGitHubService:
+    """Test cases for conditional GET caching"""
+    
+    @pytest.fixture(autouse=True)
+    def clear_etag_cache(self):
+        GitHubService.clear_etag_cache()
+        yield
+        GitHubService.clear_etag_cache()
+    
+    @pytest.mark.asyncio
+    async def test_not_modified_returns_cached_body(self):
+        """Test that a 304 is answered from the cached response"""
+        requests = []
+        github_service = GitHubService(_github_client(requests))
+        
+        first = await github_service.get_user_info("token-a")
+        first["login"] = "mutated"
+        second = await github_service.get_user_info("token-a")
+        
+        assert second == {"login": "octocat"}
+        assert "If-None-Match" not in requests[0].headers
+        assert requests[1].headers["If-None-Match"] == '"v1"'
+        await github_service.close()
+    
+    @pytest.mark.asyncio
+    async def test_cache_is_per_token(self):
+        """Test that another token never revalidates against someone else's response"""
+        requests = []
+        github_service = GitHubService(_github_client(requests))
+        
+        await github_service.get_user_info("token-a")
+        await github_service.get_user_info("token-b")
+        
+        assert "If-None-Match" not in requests[1].headers
+        await github_service.close()
+    
+    @pytest.mark.asyncio
+    async def test_expired_entry_is_not_revalidated(self, monkeypatch):
+        """Test that a response past its TTL is fetched again in full"""
+        requests = []
+        github_service = GitHubService(_github_client(requests))
+        
+        monkeypatch.setattr(github_service_module, "ETAG_CACHE_TTL_SECONDS", -1)
+        await github_service.get_user_info("token-a")
+        await github_service.get_user_info("token-a")
+        
+        assert "If-None-Match" not in requests[1].headers
+        await github_service.close()
+    
+    @pytest.mark.asyncio
+    async def test_cache_is_bounded_by_size(self, monkeypatch):
+        """Test that oversized bodies are skipped and the oldest entries make room for new ones"""
+        requests = []
+        github_service = GitHubService(_github_client(requests))
+        body_size = len(b'{"login":"octocat"}')
+        
+        monkeypatch.setattr(github_service_module, "ETAG_CACHE_MAX_BODY_BYTES", body_size - 1)
+        await github_service.get_user_info("token-a")
+        assert GitHubService._etag_cache == {}
+        
+        monkeypatch.setattr(github_service_module, "ETAG_CACHE_MAX_BODY_BYTES", body_size)
+        monkeypatch.setattr(github_service_module, "ETAG_CACHE_MAX_BYTES", body_size)
+        await github_service.get_user_info("token-a")
+        await github_service.get_user_info("token-b")
+        
+        assert len(GitHubService._etag_cache) == 1
+        assert GitHubService._etag_cache_bytes == body_size
+        await github_service.get_user_info("token-a")
+        assert "If-None-Match" not in requests[-1].headers
+        await github_service.close()
+    
+    @pytest.mark.asyncio
+    async def test_analyze_repository_structure_reads_subdirectories(self):
+        """Test that source directories and package.json feed the analysis, and one failed fetch doesn't abort it"""
+        github_service = GitHubService(_repository_client())
+        
+        analysis = await github_service.analyze_repository_structure("token-a", "o", "r")
+        
+        assert analysis["languages"] == ["javascript"]
+        assert analysis["framework"] == "nextjs"
+        assert analysis["test_frameworks"] == ["jest"]
+        await github_service.close()
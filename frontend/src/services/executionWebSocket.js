@@ -50,7 +50,12 @@ class ExecutionWebSocketService {
         this.ws.onmessage = (event) => {
           try {
             const data = JSON.parse(event.data);
-            this.handleMessage(data);
+            // Execution updates may arrive batched as an array in a single frame
+            if (Array.isArray(data)) {
+              data.forEach(message => this.handleMessage(message));
+            } else {
+              this.handleMessage(data);
+            }
           } catch (error) {
             console.error('Failed to parse WebSocket message:', error);
           }
@@ -180,6 +185,19 @@ class ExecutionWebSocketService {
         }
         break;
 
+      case 'terminal_batch':
+        if (data.data && Array.isArray(data.data.outputs)) {
+          data.data.outputs.forEach(output => {
+            addTerminalOutput({
+              type: output.type || 'stdout',
+              content: output.content,
+              stepId: output.step_id,
+              agent: output.agent
+            });
+          });
+        }
+        break;
+
       case 'execution_completed':
         updateExecutionStatus('completed');
         addTerminalOutput({